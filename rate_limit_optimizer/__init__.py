@@ -14,10 +14,38 @@ from .models import (
     DetectionResult
 )
 
-from .config import Config, ConfigManager
-from .detection import MultiTierDetector, RateLimitDetector
-from .ai import AIRecommender
-from .storage import JSONResultsStorage
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import Config, ConfigManager
+    from .detection import MultiTierDetector, RateLimitDetector
+    from .ai import AIRecommender
+    from .storage import JSONResultsStorage
+
+# Модули с тяжелыми зависимостями (aiohttp и др.) импортируются при первом обращении (PEP 562)
+_LAZY_IMPORTS = {
+    "Config": ".config",
+    "ConfigManager": ".config",
+    "MultiTierDetector": ".detection",
+    "RateLimitDetector": ".detection",
+    "AIRecommender": ".ai",
+    "JSONResultsStorage": ".storage",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # Следующие обращения идут мимо __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
 __all__ = [
     "RateLimit",
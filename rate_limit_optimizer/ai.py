@@ -2,15 +2,23 @@
 AI рекомендации через OpenRouter API
 """
 import asyncio
-import json
 import logging
+import math
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import Dict, Any, Final, Optional, List
 import hashlib
 
 import aiohttp
+import orjson
+from cachetools import TTLCache
 from aiohttp import ClientTimeout, ClientError
+from pydantic import ValidationError
 
 from .models import (
     MultiTierResult, AIRecommendations, RecommendationAnalysis, APIContext
@@ -19,29 +27,70 @@ from .exceptions import AIServiceError
 
 logger = logging.getLogger(__name__)
 
+# Разделитель полей ключа кэша (ASCII Unit Separator не встречается в URL и именах)
+_CACHE_KEY_SEPARATOR = "\x1f"
+
 
 class OpenRouterClient:
     """Клиент для OpenRouter API"""
     
-    def __init__(self, api_key: str, base_url: str = "https://openrouter.ai/api/v1"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://openrouter.ai/api/v1",
+        max_concurrency: int = 20,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 10.0
+    ):
         self.api_key = api_key
         self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
         self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
     
-    async def __aenter__(self):
+    async def start(self) -> None:
+        """Создание долгоживущей сессии (один раз на время жизни клиента)"""
+        
+        # Семафор создается внутри работающего event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        if self.session and not self.session.closed:
+            return
+        
         timeout = ClientTimeout(total=60)  # AI запросы могут быть долгими
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=self.max_concurrency,
+            ttl_dns_cache=300,
+            keepalive_timeout=75
+        )
         self.session = aiohttp.ClientSession(
             timeout=timeout,
+            connector=connector,
             headers={
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
             }
         )
-        return self
     
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def close(self) -> None:
+        """Закрытие сессии"""
+        
         if self.session:
             await self.session.close()
+            self.session = None
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
     
     async def chat_completion(
         self,
@@ -53,11 +102,11 @@ class OpenRouterClient:
     ) -> Dict[str, Any]:
         """Запрос к chat completion API"""
         
-        if not self.session:
-            async with self:
-                return await self._chat_completion_impl(model, messages, temperature, max_tokens, top_p)
-        else:
-            return await self._chat_completion_impl(model, messages, temperature, max_tokens, top_p)
+        # Сессия создается лениво при первом запросе и переиспользуется дальше
+        if not self.session or self.session.closed or self._semaphore is None:
+            await self.start()
+        
+        return await self._chat_completion_impl(model, messages, temperature, max_tokens, top_p)
     
     async def _chat_completion_impl(
         self,
@@ -79,36 +128,86 @@ class OpenRouterClient:
             "top_p": top_p
         }
         
+        body = orjson.dumps(payload)
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Ограничиваем число одновременных запросов лимитом коннектора на хост
+                async with self._semaphore:
+                    # Content-Type: application/json уже задан в заголовках сессии
+                    async with self.session.post(url, data=body) as response:
+                        if response.status == 401:
+                            raise AIServiceError("Неверный API ключ OpenRouter")
+                        elif response.status == 429:
+                            retry_after = response.headers.get("Retry-After")
+                            delay = self._retry_after_delay(retry_after, attempt)
+                            error = AIServiceError(
+                                f"Rate limit OpenRouter API, повторите через {retry_after or f'{delay:.1f}'}s"
+                            )
+                        elif response.status >= 500:
+                            delay = self._backoff_delay(attempt)
+                            error = AIServiceError(f"Ошибка сервера OpenRouter: {response.status}")
+                        elif response.status != 200:
+                            error_text = await response.text()
+                            raise AIServiceError(f"Ошибка OpenRouter API: {response.status} - {error_text}")
+                        else:
+                            return orjson.loads(await response.read())
+                    
+            except ClientError as e:
+                raise AIServiceError(f"Сетевая ошибка при обращении к OpenRouter: {e}")
+            except asyncio.TimeoutError:
+                raise AIServiceError("Таймаут при обращении к OpenRouter API")
+            
+            # 429 и 5xx временные: повторяем, пока есть попытки и ожидание разумное
+            if attempt == self.max_retries or delay > self.max_backoff:
+                raise error
+            
+            logger.warning("%s; повтор %d/%d через %.2fs", error, attempt + 1, self.max_retries, delay)
+            await asyncio.sleep(delay)
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка с jitter, не превышающая max_backoff
+        
+        Ограничение применяется после jitter: иначе задержка на верхней
+        границе превышала бы max_backoff и повтор отменялся.
+        """
+        return min(self.max_backoff, self.base_backoff * 2 ** attempt + random.uniform(0, self.base_backoff))
+    
+    def _retry_after_delay(self, retry_after: Optional[str], attempt: int) -> float:
+        """Задержка из заголовка Retry-After, иначе экспоненциальная"""
+        
         try:
-            async with self.session.post(url, json=payload) as response:
-                if response.status == 401:
-                    raise AIServiceError("Неверный API ключ OpenRouter")
-                elif response.status == 429:
-                    retry_after = response.headers.get("Retry-After", "60")
-                    raise AIServiceError(f"Rate limit OpenRouter API, повторите через {retry_after}s")
-                elif response.status >= 500:
-                    raise AIServiceError(f"Ошибка сервера OpenRouter: {response.status}")
-                elif response.status != 200:
-                    error_text = await response.text()
-                    raise AIServiceError(f"Ошибка OpenRouter API: {response.status} - {error_text}")
-                
-                return await response.json()
-                
-        except ClientError as e:
-            raise AIServiceError(f"Сетевая ошибка при обращении к OpenRouter: {e}")
-        except asyncio.TimeoutError:
-            raise AIServiceError("Таймаут при обращении к OpenRouter API")
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return self._backoff_delay(attempt)
+
+
+# Неизменные части промпта анализа собираются один раз при импорте модуля
+_PROMPT_HEADER: Final[str] = "Проанализируй результаты тестирования rate limits для API:\n\n"
+_RECOMMENDATION_EXAMPLE: Final[Dict[str, Any]] = {
+    "optimal_usage_strategy": "детальная стратегия использования",
+    "implementation_patterns": ["паттерн 1", "паттерн 2", "паттерн 3"],
+    "error_handling_advice": ["совет 1", "совет 2", "совет 3"],
+    "monitoring_suggestions": ["предложение 1", "предложение 2", "предложение 3"],
+    "scaling_recommendations": ["рекомендация 1", "рекомендация 2", "рекомендация 3"],
+    "confidence_score": 0.95,
+    "risk_assessment": "LOW/MEDIUM/HIGH - описание",
+    "estimated_cost_impact": "описание влияния на затраты",
+}
+_RECOMMENDATION_FOOTER: Final[str] = (
+    "\n\nДай практические рекомендации в формате JSON с полями:\n"
+    + orjson.dumps(_RECOMMENDATION_EXAMPLE, option=orjson.OPT_INDENT_2).decode()
+)
 
 
 class PromptBuilder:
     """Построитель промптов для AI анализа"""
     
-    def __init__(self):
-        self.system_prompt = (
-            "Ты эксперт по оптимизации API rate limits. "
-            "Анализируй результаты тестирования и давай практические рекомендации для разработчиков. "
-            "Отвечай на русском языке в формате JSON."
-        )
+    system_prompt = (
+        "Ты эксперт по оптимизации API rate limits. "
+        "Анализируй результаты тестирования и давай практические рекомендации для разработчиков. "
+        "Отвечай на русском языке в формате JSON."
+    )
     
     def build_analysis_prompt(
         self,
@@ -119,78 +218,60 @@ class PromptBuilder:
     ) -> str:
         """Построение промпта для анализа результатов"""
         
-        prompt_parts = [
-            f"Проанализируй результаты тестирования rate limits для API:",
-            f"",
+        body = [
             f"API: {context.api_name} ({context.base_url})",
             f"Тип API: {context.api_type}",
             f"Аутентификация: {context.authentication_type}",
         ]
         
         if include_business_context:
-            prompt_parts.extend([
+            body.extend((
                 f"Назначение: {context.primary_use_case}",
                 f"Критичность: {context.business_criticality}",
                 f"Ожидаемая нагрузка: {context.expected_load}",
-                f""
-            ])
+                "",
+            ))
         
-        prompt_parts.append("Обнаруженные лимиты:")
+        body.append("Обнаруженные лимиты:")
         
         # Добавляем информацию о лимитах
-        if results.ten_second_limit:
-            prompt_parts.append(f"- 10 секунд: {results.ten_second_limit.limit} запросов")
-        if results.minute_limit:
-            prompt_parts.append(f"- Минута: {results.minute_limit.limit} запросов")
-        if results.fifteen_minute_limit:
-            prompt_parts.append(f"- 15 минут: {results.fifteen_minute_limit.limit} запросов")
-        if results.hour_limit:
-            prompt_parts.append(f"- Час: {results.hour_limit.limit} запросов")
-        if results.day_limit:
-            prompt_parts.append(f"- День: {results.day_limit.limit} запросов")
-        
-        prompt_parts.extend([
-            f"",
+        body.extend([
+            f"- {label}: {limit.limit} запросов"
+            for label, limit in (
+                ("10 секунд", results.ten_second_limit),
+                ("Минута", results.minute_limit),
+                ("15 минут", results.fifteen_minute_limit),
+                ("Час", results.hour_limit),
+                ("День", results.day_limit),
+            )
+            if limit
+        ])
+        
+        body.extend((
+            "",
             f"Самый строгий лимит: {results.most_restrictive}",
             f"Рекомендуемая частота: {results.recommended_rate} запросов",
             f"Уверенность: {results.confidence_score:.2%}",
-        ])
+        ))
         
         if include_technical_details:
-            prompt_parts.extend([
-                f"",
-                f"Технические детали:",
+            body.extend((
+                "",
+                "Технические детали:",
                 f"- Всего запросов отправлено: {results.total_requests}",
                 f"- Длительность тестирования: {results.test_duration_seconds:.1f} секунд",
                 f"- Процент успешности: {results.success_rate:.2%}",
-            ])
+            ))
             
             if results.headers_found:
-                prompt_parts.append("- Найденные заголовки:")
-                for header, value in results.headers_found.items():
-                    prompt_parts.append(f"  {header}: {value}")
+                body.append("- Найденные заголовки:")
+                body.extend([f"  {header}: {value}" for header, value in results.headers_found.items()])
             
             if results.error_patterns:
-                prompt_parts.append("- Паттерны ошибок:")
-                for pattern in results.error_patterns:
-                    prompt_parts.append(f"  {pattern}")
-        
-        prompt_parts.extend([
-            f"",
-            f"Дай практические рекомендации в формате JSON с полями:",
-            f"{{",
-            f'  "optimal_usage_strategy": "детальная стратегия использования",',
-            f'  "implementation_patterns": ["паттерн 1", "паттерн 2", "паттерн 3"],',
-            f'  "error_handling_advice": ["совет 1", "совет 2", "совет 3"],',
-            f'  "monitoring_suggestions": ["предложение 1", "предложение 2", "предложение 3"],',
-            f'  "scaling_recommendations": ["рекомендация 1", "рекомендация 2", "рекомендация 3"],',
-            f'  "confidence_score": 0.95,',
-            f'  "risk_assessment": "LOW/MEDIUM/HIGH - описание",',
-            f'  "estimated_cost_impact": "описание влияния на затраты"',
-            f"}}"
-        ])
+                body.append("- Паттерны ошибок:")
+                body.extend([f"  {pattern}" for pattern in results.error_patterns])
         
-        return "\n".join(prompt_parts)
+        return "".join((_PROMPT_HEADER, "\n".join(body), _RECOMMENDATION_FOOTER))
 
 
 class RecommendationGenerator:
@@ -200,12 +281,21 @@ class RecommendationGenerator:
         self,
         openrouter_api_key: str,
         models: List[str] = None,
-        consensus_threshold: float = 0.7
+        consensus_threshold: float = 0.7,
+        max_concurrent_requests: Optional[int] = None,
+        consensus_mode: str = "all"
     ):
+        if consensus_mode not in ("all", "first_valid"):
+            raise ValueError(f"Неизвестный режим консенсуса: {consensus_mode}")
+        
         self.api_key = openrouter_api_key
         self.models = models or ["anthropic/claude-3.5-sonnet"]
         self.consensus_threshold = consensus_threshold
+        # "all" - ждем все модели, "first_valid" - первый корректный ответ отменяет остальные
+        self.consensus_mode = consensus_mode
+        self.max_concurrent_requests = max_concurrent_requests or len(self.models)
         self.client = OpenRouterClient(openrouter_api_key)
+        self.prompt_builder = PromptBuilder()
     
     async def generate_consensus_recommendations(
         self,
@@ -214,29 +304,24 @@ class RecommendationGenerator:
     ) -> AIRecommendations:
         """Генерация консенсусных рекомендаций от нескольких моделей"""
         
-        prompt_builder = PromptBuilder()
-        prompt = prompt_builder.build_analysis_prompt(test_results, api_context)
+        # Промпт строится один раз и разделяется всеми моделями
+        prompt = self.prompt_builder.build_analysis_prompt(test_results, api_context)
         
-        model_responses = []
+        # Запросы к моделям выполняются параллельно через общую сессию
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
         
-        async with self.client:
-            for model in self.models:
-                try:
-                    response = await self.client.chat_completion(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": prompt_builder.system_prompt},
-                            {"role": "user", "content": prompt}
-                        ]
-                    )
-                    
-                    model_responses.append({
-                        "model": model,
-                        "response": response
-                    })
-                    
-                except Exception as e:
-                    logger.warning(f"Ошибка получения рекомендаций от модели {model}: {e}")
+        if self.consensus_mode == "first_valid":
+            return await self._first_valid_recommendations(semaphore, prompt)
+        
+        # TaskGroup отменяет все запросы при отмене вызывающего; ошибки отдельных
+        # моделей перехватываются в _collect_model_response и группу не рушат
+        async with asyncio.TaskGroup() as task_group:
+            tasks = [
+                task_group.create_task(self._collect_model_response(semaphore, model, prompt))
+                for model in self.models
+            ]
+        
+        model_responses = [task.result() for task in tasks if task.result() is not None]
         
         if not model_responses:
             raise AIServiceError("Не удалось получить рекомендации ни от одной модели")
@@ -253,6 +338,92 @@ class RecommendationGenerator:
             model_responses=model_responses
         )
     
+    async def _first_valid_recommendations(
+        self,
+        semaphore: asyncio.Semaphore,
+        prompt: str
+    ) -> AIRecommendations:
+        """Рекомендации по первому корректному ответу, остальные запросы отменяются"""
+        
+        task_models = {
+            asyncio.create_task(
+                self._request_model(semaphore, model, self.prompt_builder.system_prompt, prompt)
+            ): model
+            for model in self.models
+        }
+        pending = set(task_models)
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    model = task_models[task]
+                    if task.exception() is not None:
+                        logger.warning("Ошибка получения рекомендаций от модели %s: %s", model, task.exception())
+                        continue
+                    
+                    response = task.result()
+                    analysis = self._parse_analysis(response)
+                    if analysis is None:
+                        continue
+                    
+                    return AIRecommendations(
+                        generated_by="first_valid_" + model,
+                        analysis=analysis,
+                        confidence_score=min(0.95, 1 / len(self.models)),
+                        risk_assessment="CONSENSUS - Рекомендации первой ответившей модели",
+                        estimated_cost_impact="Консенсусная оценка влияния на затраты",
+                        model_responses=[{"model": model, "response": response}]
+                    )
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        raise AIServiceError("Не удалось получить рекомендации ни от одной модели")
+    
+    async def _collect_model_response(
+        self,
+        semaphore: asyncio.Semaphore,
+        model: str,
+        prompt: str
+    ) -> Optional[Dict[str, Any]]:
+        """Ответ одной модели для консенсуса, None при ошибке"""
+        
+        try:
+            response = await self._request_model(semaphore, model, self.prompt_builder.system_prompt, prompt)
+        except Exception as e:
+            logger.warning("Ошибка получения рекомендаций от модели %s: %s", model, e)
+            return None
+        
+        return {
+            "model": model,
+            "response": response
+        }
+    
+    async def _request_model(
+        self,
+        semaphore: asyncio.Semaphore,
+        model: str,
+        system_prompt: str,
+        prompt: str
+    ) -> Dict[str, Any]:
+        """Запрос рекомендаций у одной модели с ограничением параллельности"""
+        
+        async with semaphore:
+            return await self.client.chat_completion(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+    
+    async def aclose(self) -> None:
+        """Закрытие HTTP сессии клиента"""
+        await self.client.close()
+    
     def _analyze_consensus(self, model_responses: List[Dict[str, Any]]) -> RecommendationAnalysis:
         """Анализ консенсуса между моделями"""
         
@@ -260,28 +431,34 @@ class RecommendationGenerator:
         # В полной реализации здесь был бы анализ консенсуса
         
         for response_data in model_responses:
-            try:
-                response = response_data["response"]
-                content = response["choices"][0]["message"]["content"]
-                
-                # Пробуем парсить JSON
-                recommendations_data = json.loads(content)
-                
-                return RecommendationAnalysis(
-                    optimal_usage_strategy=recommendations_data.get("optimal_usage_strategy", ""),
-                    implementation_patterns=recommendations_data.get("implementation_patterns", []),
-                    error_handling_advice=recommendations_data.get("error_handling_advice", []),
-                    monitoring_suggestions=recommendations_data.get("monitoring_suggestions", []),
-                    scaling_recommendations=recommendations_data.get("scaling_recommendations", [])
-                )
-                
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.warning(f"Ошибка парсинга ответа модели: {e}")
-                continue
+            analysis = self._parse_analysis(response_data["response"])
+            if analysis is not None:
+                return analysis
         
         # Fallback если не удалось парсить
         return self._create_fallback_analysis()
     
+    def _parse_analysis(self, response: Dict[str, Any]) -> Optional[RecommendationAnalysis]:
+        """Разбор ответа модели, None если ответ некорректен"""
+        
+        try:
+            content = response["choices"][0]["message"]["content"]
+            
+            # Пробуем парсить JSON
+            recommendations_data = orjson.loads(content)
+            
+            return RecommendationAnalysis(
+                optimal_usage_strategy=recommendations_data.get("optimal_usage_strategy", ""),
+                implementation_patterns=recommendations_data.get("implementation_patterns", []),
+                error_handling_advice=recommendations_data.get("error_handling_advice", []),
+                monitoring_suggestions=recommendations_data.get("monitoring_suggestions", []),
+                scaling_recommendations=recommendations_data.get("scaling_recommendations", [])
+            )
+            
+        except (orjson.JSONDecodeError, KeyError) as e:
+            logger.warning("Ошибка парсинга ответа модели: %s", e)
+            return None
+    
     def _create_fallback_analysis(self) -> RecommendationAnalysis:
         """Создание fallback анализа"""
         return RecommendationAnalysis(
@@ -309,8 +486,80 @@ class RecommendationGenerator:
         )
 
 
+class RecommendationCacheStore:
+    """Персистентный кэш AI рекомендаций в SQLite, общий для процессов и перезапусков
+    
+    Методы синхронные; AIRecommender вызывает их через asyncio.to_thread,
+    поэтому обращения к соединению сериализуются блокировкой.
+    """
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "ai_recommendations.sqlite3"
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS recommendations ("
+            "cache_key TEXT PRIMARY KEY, "
+            "payload TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def get(self, cache_key: str) -> Optional[str]:
+        """Получение записи, если она не устарела"""
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM recommendations WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            
+            if row is None:
+                return None
+            
+            payload, expires_at = row
+            if expires_at < time.time():
+                self._delete(cache_key)
+                return None
+            
+            return payload
+    
+    def set(self, cache_key: str, payload: str, ttl_seconds: float) -> None:
+        """Сохранение записи с временем жизни"""
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recommendations (cache_key, payload, expires_at) VALUES (?, ?, ?)",
+                (cache_key, payload, time.time() + ttl_seconds)
+            )
+            self._conn.commit()
+    
+    def delete(self, cache_key: str) -> None:
+        """Удаление записи (например, поврежденной или устаревшей схемы)"""
+        
+        with self._lock:
+            self._delete(cache_key)
+    
+    def _delete(self, cache_key: str) -> None:
+        self._conn.execute("DELETE FROM recommendations WHERE cache_key = ?", (cache_key,))
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """Закрытие соединения с базой"""
+        with self._lock:
+            self._conn.close()
+
+
 class AIRecommender:
-    """Основной класс для генерации AI рекомендаций"""
+    """Основной класс для генерации AI рекомендаций
+    
+    Сессия OpenRouter живет столько же, сколько рекомендатор, и переиспользуется
+    всеми вызовами: async with AIRecommender(...) as recommender: ...
+    """
     
     def __init__(
         self,
@@ -321,7 +570,9 @@ class AIRecommender:
         cache_recommendations: bool = True,
         cache_ttl_hours: int = 24,
         fallback_on_error: bool = True,
-        request_timeout: float = 60.0
+        request_timeout: float = 60.0,
+        cache_dir: Optional[Path] = None,
+        cache_rate_tolerance: float = 0.1
     ):
         self.api_key = openrouter_api_key
         self.model = model
@@ -329,10 +580,28 @@ class AIRecommender:
         self.max_tokens = max_tokens
         self.cache_recommendations = cache_recommendations
         self.cache_ttl_hours = cache_ttl_hours
+        self._cache_ttl_seconds = cache_ttl_hours * 3600
+        # Относительный шаг квантования recommended_rate в ключе кэша:
+        # соседние корзины отличаются примерно на cache_rate_tolerance
+        self.cache_rate_tolerance = max(0.01, cache_rate_tolerance)
+        self._log_rate_step = math.log1p(self.cache_rate_tolerance)
         self.fallback_on_error = fallback_on_error
         self.request_timeout = request_timeout
         
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        # Ограниченный по размеру кэш с вытеснением по TTL (time.monotonic)
+        self._cache: TTLCache = TTLCache(
+            maxsize=int(os.getenv('RLO_CACHE_MAX', 1024)),
+            ttl=self._cache_ttl_seconds
+        )
+        
+        # Выполняющиеся запросы к AI по ключу кэша (singleflight)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        # Персистентный кэш включается явно: параметром или через RLO_CACHE_DIR
+        cache_dir = cache_dir or os.getenv('RLO_CACHE_DIR')
+        self._store: Optional[RecommendationCacheStore] = None
+        if cache_recommendations and cache_dir:
+            self._store = RecommendationCacheStore(Path(cache_dir))
         
         self.client = OpenRouterClient(openrouter_api_key)
         self.prompt_builder = PromptBuilder()
@@ -344,59 +613,78 @@ class AIRecommender:
     ) -> AIRecommendations:
         """Генерация AI рекомендаций"""
         
+        cache_key = self._generate_cache_key(test_results, api_context)
+        
         # Проверяем кэш
         if self.cache_recommendations:
-            cache_key = self._generate_cache_key(test_results, api_context)
-            cached = self._get_from_cache(cache_key)
-            if cached:
+            cached = await self._get_from_cache(cache_key)
+            if cached is not None:
                 logger.info("Используем кэшированные AI рекомендации")
-                return AIRecommendations(**cached)
+                return cached
         
         try:
-            # Генерируем рекомендации
-            recommendations = await self._generate_recommendations_impl(test_results, api_context)
-            
-            # Сохраняем в кэш
-            if self.cache_recommendations:
-                self._save_to_cache(cache_key, recommendations.model_dump())
+            # Одинаковые параллельные запросы ждут один общий вызов AI
+            task = self._inflight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._generate_and_cache(cache_key, test_results, api_context)
+                )
+                self._inflight[cache_key] = task
             
-            return recommendations
+            # shield: отмена одного из ожидающих не отменяет общий запрос
+            return await asyncio.shield(task)
             
         except Exception as e:
-            logger.error(f"Ошибка генерации AI рекомендаций: {e}")
+            logger.error("Ошибка генерации AI рекомендаций: %s", e)
             
             if self.fallback_on_error:
                 return self._create_fallback_recommendations(test_results, str(e))
             else:
                 raise AIServiceError(f"Не удалось сгенерировать AI рекомендации: {e}")
     
-    async def _generate_recommendations_impl(
+    async def _generate_and_cache(
         self,
+        cache_key: str,
         test_results: MultiTierResult,
         api_context: APIContext
     ) -> AIRecommendations:
-        """Внутренняя реализация генерации рекомендаций"""
+        """Общий для одинаковых запросов вызов AI с сохранением в кэш"""
         
-        prompt = self.prompt_builder.build_analysis_prompt(test_results, api_context)
-        
-        async with self.client:
-            response = await self.client.chat_completion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.prompt_builder.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
+        try:
+            # Промпт строится только при промахе кэша и ровно один раз
+            prompt = self.prompt_builder.build_analysis_prompt(test_results, api_context)
+            
+            # Генерируем рекомендации
+            recommendations = await self._generate_recommendations_impl(prompt)
+            
+            # Сохраняем в кэш
+            if self.cache_recommendations:
+                await self._save_to_cache(cache_key, recommendations)
+            
+            return recommendations
+        finally:
+            self._inflight.pop(cache_key, None)
+    
+    async def _generate_recommendations_impl(self, prompt: str) -> AIRecommendations:
+        """Внутренняя реализация генерации рекомендаций по готовому промпту"""
+        
+        response = await self.client.chat_completion(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.prompt_builder.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
         
         # Парсим ответ
         content = response["choices"][0]["message"]["content"]
         
         try:
-            recommendations_data = json.loads(content)
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON ответа от AI: {e}")
+            recommendations_data = orjson.loads(content)
+        except orjson.JSONDecodeError as e:
+            logger.error("Ошибка парсинга JSON ответа от AI: %s", e)
             raise AIServiceError(f"Некорректный JSON ответ от AI: {content[:200]}...")
         
         # Создаем объект рекомендаций
@@ -416,6 +704,21 @@ class AIRecommender:
             estimated_cost_impact=recommendations_data.get("estimated_cost_impact", "Требует дополнительного анализа")
         )
     
+    async def __aenter__(self):
+        await self.client.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Закрытие HTTP сессии клиента и персистентного кэша"""
+        await self.client.close()
+        
+        if self._store:
+            self._store.close()
+            self._store = None
+    
     def _create_fallback_recommendations(self, test_results: MultiTierResult, error_details: str) -> AIRecommendations:
         """Создание fallback рекомендаций при ошибке AI"""
         
@@ -465,42 +768,81 @@ class AIRecommender:
     def _generate_cache_key(self, test_results: MultiTierResult, api_context: APIContext) -> str:
         """Генерация ключа кэша"""
         
-        # Создаем хэш на основе ключевых параметров
-        key_data = {
-            "api_name": api_context.api_name,
-            "base_url": api_context.base_url,
-            "most_restrictive": test_results.most_restrictive,
-            "recommended_rate": test_results.recommended_rate,
-            "limits_found": test_results.limits_found,
-            "model": self.model
-        }
+        # Создаем хэш на основе ключевых параметров. Порядок полей фиксирован,
+        # поэтому блоб канонический без сортировки ключей и json.dumps.
+        # recommended_rate немного плавает между прогонами, поэтому квантуется
+        # логарифмически (одинаковая относительная точность для 2 и 2000 rps),
+        # а от base_url берется только хост
+        rate = test_results.recommended_rate
+        rate_bucket = round(math.log(rate) / self._log_rate_step) if rate > 0 else "zero"
+        key_parts = (
+            api_context.api_name,
+            urlparse(api_context.base_url).netloc or api_context.base_url,
+            test_results.most_restrictive,
+            str(rate_bucket),
+            str(test_results.limits_found),
+            self.model
+        )
         
-        key_string = json.dumps(key_data, sort_keys=True)
-        return hashlib.md5(key_string.encode()).hexdigest()
+        key_blob = _CACHE_KEY_SEPARATOR.join(key_parts).encode()
+        return hashlib.blake2b(key_blob, digest_size=16).hexdigest()
     
-    def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+    async def _get_from_cache(self, cache_key: str) -> Optional[AIRecommendations]:
         """Получение из кэша"""
         
-        if cache_key not in self._cache:
+        # TTLCache сам отбрасывает устаревшие записи
+        cached_data = self._cache.get(cache_key)
+        if cached_data is None:
+            return await self._get_from_store(cache_key)
+        
+        return cached_data
+    
+    async def _get_from_store(self, cache_key: str) -> Optional[AIRecommendations]:
+        """Получение из персистентного кэша с прогревом кэша в памяти
+        
+        SQLite вызывается в потоке, чтобы не блокировать event loop. Ошибка
+        базы или запись, не проходящая валидацию (повреждена или сохранена
+        старой схемой), считаются промахом; такая запись удаляется.
+        """
+        
+        if not self._store:
             return None
         
-        cached_data = self._cache[cache_key]
-        cached_time = datetime.fromisoformat(cached_data["cached_at"])
+        try:
+            payload = await asyncio.to_thread(self._store.get, cache_key)
+        except sqlite3.Error as e:
+            logger.warning("Ошибка чтения персистентного кэша AI: %s", e)
+            return None
+        
+        if payload is None:
+            return None
         
-        # Проверяем TTL
-        if datetime.now() - cached_time > timedelta(hours=self.cache_ttl_hours):
-            del self._cache[cache_key]
+        try:
+            recommendations = AIRecommendations.model_validate_json(payload)
+        except ValidationError as e:
+            logger.warning("Некорректная запись в кэше AI рекомендаций, удаляем: %s", e)
+            try:
+                await asyncio.to_thread(self._store.delete, cache_key)
+            except sqlite3.Error as delete_error:
+                logger.warning("Ошибка удаления записи кэша AI: %s", delete_error)
             return None
         
-        return cached_data["data"]
+        self._cache[cache_key] = recommendations
+        return recommendations
     
-    def _save_to_cache(self, cache_key: str, data: Dict[str, Any]) -> None:
+    async def _save_to_cache(self, cache_key: str, recommendations: AIRecommendations) -> None:
         """Сохранение в кэш"""
         
-        self._cache[cache_key] = {
-            "data": data,
-            "cached_at": datetime.now().isoformat()
-        }
+        # В памяти храним уже провалидированную модель, без model_dump и повторной валидации
+        self._cache[cache_key] = recommendations
+        
+        if self._store:
+            try:
+                await asyncio.to_thread(
+                    self._store.set, cache_key, recommendations.model_dump_json(), self._cache_ttl_seconds
+                )
+            except sqlite3.Error as e:
+                logger.warning("Ошибка записи персистентного кэша AI: %s", e)
     
     @classmethod
     def from_environment(cls) -> 'AIRecommender':
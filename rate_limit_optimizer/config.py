@@ -1,13 +1,19 @@
 """
 Управление конфигурацией Rate Limit Optimizer
 """
-import json
+import copy
+import mmap
 import os
+import re
+import sys
+from collections import deque
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field, field_validator
+from typing import Dict, Any, Optional, List, Tuple, Union
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 import logging
 
+import orjson
+
 from .models import (
     TargetSite, DetectionSettings, OptimizationStrategy, AISettings,
     ResultsStorage, MonitoringConfig, RetryPolicy, LoggingConfig, NetworkConfig,
@@ -18,6 +24,24 @@ from .models import (
 
 logger = logging.getLogger(__name__)
 
+# Значение-ссылка на переменную окружения: ${VAR_NAME}
+_ENV_VAR_RE = re.compile(r'^\$\{([A-Za-z_][A-Za-z0-9_]*)\}$')
+
+# Начиная с этого размера файл конфигурации читается через mmap
+_MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+
+# Имена поддерживаемых стратегий оптимизации
+_KNOWN_STRATEGIES = frozenset({'multi_tier_ramp', 'header_analysis', 'intelligent_probing'})
+
+
+# Классы стратегий оптимизации по имени
+_STRATEGY_CLASSES: Dict[str, type] = {
+    'multi_tier_ramp': MultiTierRampStrategy,
+    'header_analysis': HeaderAnalysisStrategy,
+    'intelligent_probing': IntelligentProbingStrategy,
+}
+
 
 class Config(BaseModel):
     """Основная конфигурация приложения"""
@@ -34,6 +58,9 @@ class Config(BaseModel):
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     network: NetworkConfig = Field(default_factory=NetworkConfig)
     
+    # Построенные стратегии: имя -> (снимок словаря конфигурации, стратегия)
+    _strategy_cache: Dict[str, Tuple[Dict[str, Any], OptimizationStrategy]] = PrivateAttr(default_factory=dict)
+    
     @field_validator('target_sites')
     @classmethod
     def validate_target_sites_not_empty(cls, v):
@@ -45,34 +72,29 @@ class Config(BaseModel):
     @classmethod
     def validate_optimization_strategies(cls, v):
         """Валидация стратегий оптимизации"""
-        valid_strategies = ['multi_tier_ramp', 'header_analysis', 'intelligent_probing']
+        # Что каждая стратегия - объект, уже проверил тип поля Dict[str, Dict[str, Any]]
+        # Порядок предупреждений совпадает с порядком стратегий в конфигурации
+        for strategy_name in [name for name in v if name not in _KNOWN_STRATEGIES]:
+            logger.warning(f"Неизвестная стратегия оптимизации: {strategy_name}")
         
-        for strategy_name, strategy_config in v.items():
-            if strategy_name not in valid_strategies:
-                logger.warning(f"Неизвестная стратегия оптимизации: {strategy_name}")
-            
-            if not isinstance(strategy_config, dict):
-                raise ValueError(f"Конфигурация стратегии {strategy_name} должна быть объектом")
-            
-            if 'enabled' not in strategy_config:
-                strategy_config['enabled'] = True
-        
-        return v
+        return {name: {'enabled': True, **strategy_config} for name, strategy_config in v.items()}
     
     def get_strategy(self, strategy_name: str) -> Optional[OptimizationStrategy]:
         """Получение стратегии оптимизации по имени"""
         strategy_config = self.optimization_strategies.get(strategy_name)
-        if not strategy_config:
+        strategy_cls = _STRATEGY_CLASSES.get(strategy_name)
+        if not strategy_config or strategy_cls is None:
             return None
         
-        if strategy_name == 'multi_tier_ramp':
-            return MultiTierRampStrategy(**strategy_config)
-        elif strategy_name == 'header_analysis':
-            return HeaderAnalysisStrategy(**strategy_config)
-        elif strategy_name == 'intelligent_probing':
-            return IntelligentProbingStrategy(**strategy_config)
+        # Стратегия валидируется заново, только если ее конфигурация изменилась
+        # (сравнение со снимком замечает и правку словаря на месте)
+        cached = self._strategy_cache.get(strategy_name)
+        if cached is not None and cached[0] == strategy_config:
+            return cached[1]
         
-        return None
+        strategy = strategy_cls(**strategy_config)
+        self._strategy_cache[strategy_name] = (copy.deepcopy(strategy_config), strategy)
+        return strategy
     
     def get_enabled_strategies(self) -> List[str]:
         """Получение списка включенных стратегий"""
@@ -84,11 +106,25 @@ class Config(BaseModel):
 
 
 class ConfigManager:
-    """Менеджер конфигурации"""
+    """Менеджер конфигурации
+    
+    Переменные окружения читаются при каждом обращении. Разобранный файл
+    конфигурации кэшируется по (mtime, размер) и значениям подставленных в него
+    переменных окружения: изменение файла или любой из этих переменных
+    приводит к повторному разбору. refresh_env() принудительно сбрасывает кэш.
+    """
     
     def __init__(self, config_path: Optional[Path] = None):
         self.config_path = config_path
         self._config: Optional[Config] = None
+        # Увеличивается при каждом изменении набора сайтов; по нему потребители
+        # сбрасывают кэши разрешенных конфигураций сайтов
+        self.sites_version = 0
+        # Разобранные файлы (после подстановки env) по пути:
+        # (mtime_ns, size, подставленные переменные окружения и их значения, данные)
+        self._parse_cache: Dict[
+            Path, Tuple[int, int, Dict[str, Optional[str]], Dict[str, Any]]
+        ] = {}
     
     def load_config(self, config_path: Optional[Path] = None) -> Config:
         """Загрузка конфигурации из файла"""
@@ -97,47 +133,162 @@ class ConfigManager:
         if not path:
             raise ValueError("Не указан путь к файлу конфигурации")
         
-        if not path.exists():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"Файл конфигурации не найден: {path}")
         
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-            
-            # Подстановка переменных окружения
-            config_data = self._substitute_env_vars(config_data)
+            cached = self._parse_cache.get(path)
+            if (
+                cached
+                and cached[0] == stat.st_mtime_ns
+                and cached[1] == stat.st_size
+                and self._env_unchanged(cached[2])
+            ):
+                # Файл и подставленные переменные не менялись: без повторного
+                # чтения, разбора JSON и подстановки env
+                config_data = cached[3]
+            else:
+                config_data = self._read_json_file(path)
+                
+                # Подстановка переменных окружения
+                used_env: Dict[str, Optional[str]] = {}
+                config_data = self._substitute_env_vars(config_data, used_env)
+                self._intern_names(config_data)
+                
+                self._parse_cache[path] = (stat.st_mtime_ns, stat.st_size, used_env, config_data)
             
             # Создание объекта конфигурации
             self._config = Config(**config_data)
+            self.sites_version += 1
             
             logger.info(f"Конфигурация успешно загружена из {path}")
             return self._config
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise ValueError(f"Ошибка парсинга JSON в файле {path}: {e}")
         except Exception as e:
             raise ValueError(f"Ошибка загрузки конфигурации: {e}")
     
-    def _substitute_env_vars(self, data: Any) -> Any:
-        """Подстановка переменных окружения в конфигурации"""
-        if isinstance(data, dict):
-            result = {}
-            for key, value in data.items():
-                if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
-                    # Извлекаем имя переменной окружения
-                    env_var = value[2:-1]
-                    env_value = os.getenv(env_var)
-                    if env_value is not None:
-                        result[key] = env_value
-                    else:
-                        result[key] = value  # Оставляем как есть если переменная не найдена
-                else:
-                    result[key] = self._substitute_env_vars(value)
-            return result
-        elif isinstance(data, list):
-            return [self._substitute_env_vars(item) for item in data]
-        else:
-            return data
+    @staticmethod
+    def _getenv(name: str) -> Optional[str]:
+        """Чтение переменной окружения (без кэширования: значения могут меняться)"""
+        return os.environ.get(name)
+    
+    @staticmethod
+    def _env_unchanged(used_env: Dict[str, Optional[str]]) -> bool:
+        """Совпадают ли текущие значения переменных с подставленными при разборе"""
+        env = os.environ
+        return all(env.get(name) == value for name, value in used_env.items())
+    
+    def refresh_env(self) -> None:
+        """Принудительный повторный разбор файлов конфигурации при следующей загрузке
+        
+        Изменения подставленных переменных окружения обнаруживаются и без этого
+        вызова; он нужен, например, если окружение меняется в обход os.environ.
+        """
+        self.invalidate_cache()
+    
+    def invalidate_cache(self) -> None:
+        """Сброс кэша разобранных файлов (например, после изменения переменных окружения)"""
+        self._parse_cache.clear()
+    
+    @staticmethod
+    def _read_json_file(path: Path) -> Any:
+        """Чтение JSON файла: большие файлы разбираются прямо из отображенной памяти"""
+        
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            
+            # orjson разбирает байты напрямую, без промежуточного декодирования в str
+            if size < _MMAP_THRESHOLD_BYTES:
+                return orjson.loads(f.read())
+            
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # madvise и его флаги есть не на всех платформах (например, Windows)
+                if hasattr(mm, 'madvise'):
+                    for advice in ('MADV_SEQUENTIAL', 'MADV_WILLNEED'):
+                        if hasattr(mmap, advice):
+                            mm.madvise(getattr(mmap, advice))
+                
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+    
+    def _substitute_env_vars(
+        self,
+        data: Any,
+        used_env: Optional[Dict[str, Optional[str]]] = None
+    ) -> Any:
+        """Подстановка переменных окружения в конфигурации
+        
+        Значения вида ${VAR} в словарях заменяются на месте; обход итеративный,
+        контейнеры без подстановок не копируются. В used_env (если передан)
+        записываются имена переменных и прочитанные значения.
+        """
+        env = os.environ
+        stack = deque([data])
+        
+        while stack:
+            node = stack.pop()
+            
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if isinstance(value, str):
+                        match = _ENV_VAR_RE.match(value)
+                        if match:
+                            name = match.group(1)
+                            env_value = env.get(name)
+                            if used_env is not None:
+                                used_env[name] = env_value
+                            # Оставляем как есть если переменная не найдена
+                            node[key] = value if env_value is None else env_value
+                    elif isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(node, list):
+                stack.extend(item for item in node if isinstance(item, (dict, list)))
+        
+        return data
+    
+    @staticmethod
+    def _intern_names(config_data: Any) -> None:
+        """Интернирование имен сайтов, стратегий, заголовков и эндпоинтов
+        
+        Эти строки постоянно используются как ключи словарей; после разбора JSON
+        каждая из них - отдельный объект, интернирование делает их общими.
+        """
+        if not isinstance(config_data, dict):
+            return
+        
+        target_sites = config_data.get('target_sites')
+        if isinstance(target_sites, dict):
+            config_data['target_sites'] = {
+                sys.intern(name): site for name, site in target_sites.items()
+            }
+            
+            for site in target_sites.values():
+                if not isinstance(site, dict):
+                    continue
+                
+                headers = site.get('headers')
+                if isinstance(headers, dict):
+                    site['headers'] = {
+                        sys.intern(header) if isinstance(header, str) else header: value
+                        for header, value in headers.items()
+                    }
+                
+                endpoints = site.get('endpoints')
+                if isinstance(endpoints, list):
+                    site['endpoints'] = [
+                        sys.intern(endpoint) if isinstance(endpoint, str) else endpoint
+                        for endpoint in endpoints
+                    ]
+        
+        strategies = config_data.get('optimization_strategies')
+        if isinstance(strategies, dict):
+            config_data['optimization_strategies'] = {
+                sys.intern(name): strategy for name, strategy in strategies.items()
+            }
     
     def save_config(self, config: Config, config_path: Optional[Path] = None) -> None:
         """Сохранение конфигурации в файл"""
@@ -153,8 +304,20 @@ class ConfigManager:
             # Сериализуем конфигурацию
             config_data = config.model_dump(exclude_none=True)
             
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False, default=str)
+            data = orjson.dumps(
+                config_data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE,
+                default=str
+            )
+            
+            # Один готовый буфер пишется напрямую в дескриптор, без буферизации файла
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
             
             logger.info(f"Конфигурация сохранена в {path}")
             
@@ -162,7 +325,7 @@ class ConfigManager:
             raise ValueError(f"Ошибка сохранения конфигурации: {e}")
     
     def validate_config(self, config_path: Optional[Path] = None) -> bool:
-        """Валидация конфигурации без загрузки"""
+        """Валидация конфигурации; загруженный результат доступен через get_config()"""
         try:
             self.load_config(config_path)
             return True
@@ -176,10 +339,6 @@ class ConfigManager:
     
     def create_default_config(self) -> Config:
         """Создание конфигурации по умолчанию"""
-        from .models import (
-            RateLimitTier, MultiTierDetection, BatchSettings, 
-            SafetySettings, EndpointRotation
-        )
         
         # Создаем тестовый сайт
         test_site = TargetSite(
@@ -225,7 +384,9 @@ class ConfigManager:
             }
         }
         
-        config = Config(
+        # Все вложенные модели уже провалидированы при создании выше,
+        # поэтому повторная валидация Config не нужна
+        config = Config.model_construct(
             target_sites={"test_site": test_site},
             detection_settings=detection_settings,
             optimization_strategies=optimization_strategies
@@ -239,29 +400,66 @@ class ConfigManager:
         return Config(**config_dict)
     
     @staticmethod
-    def from_json_string(json_string: str) -> Config:
+    def from_json_string(json_string: Union[str, bytes]) -> Config:
         """Создание конфигурации из JSON строки"""
-        config_dict = json.loads(json_string)
+        config_dict = orjson.loads(json_string)
         return ConfigManager.from_dict(config_dict)
     
     def merge_configs(self, base_config: Config, override_config: Dict[str, Any]) -> Config:
-        """Слияние конфигураций"""
-        base_dict = base_config.model_dump()
+        """Слияние конфигураций
         
-        # Рекурсивное слияние
-        merged_dict = self._deep_merge(base_dict, override_config)
+        Сериализуются и валидируются только секции, затронутые override_config;
+        остальные копируются из base_config без повторной валидации. Результат
+        не разделяет изменяемых значений ни с base_config, ни с override_config.
+        """
+        merged = base_config.model_copy(deep=True)
         
-        return Config(**merged_dict)
+        for key, value in override_config.items():
+            if key not in Config.model_fields:
+                continue  # Как и Config(**data), неизвестные поля игнорируем
+            
+            value = copy.deepcopy(value)
+            current = getattr(merged, key)
+            if isinstance(value, dict) and isinstance(current, (BaseModel, dict)):
+                # Рекурсивное слияние только этой секции
+                value = self._deep_merge(self._section_to_dict(current), value)
+            
+            Config.__pydantic_validator__.validate_assignment(merged, key, value)
+        
+        return merged
+    
+    @staticmethod
+    def _section_to_dict(section: Union[BaseModel, Dict[str, Any]]) -> Dict[str, Any]:
+        """Секция конфигурации в виде словаря для слияния"""
+        if isinstance(section, BaseModel):
+            return section.model_dump()
+        
+        return {
+            key: value.model_dump() if isinstance(value, BaseModel) else value
+            for key, value in section.items()
+        }
     
     def _deep_merge(self, base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
-        """Глубокое слияние словарей"""
+        """Глубокое слияние словарей
+        
+        Копируются только узлы на пути изменений, остальные ветви base
+        разделяются с результатом по ссылке.
+        """
         result = base.copy()
+        stack = [(result, override)]
         
-        for key, value in override.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._deep_merge(result[key], value)
-            else:
-                result[key] = value
+        while stack:
+            target, changes = stack.pop()
+            
+            for key, value in changes.items():
+                current = target.get(key)
+                if isinstance(current, dict) and isinstance(value, dict):
+                    if value:
+                        child = current.copy()
+                        target[key] = child
+                        stack.append((child, value))
+                else:
+                    target[key] = value
         
         return result
     
@@ -278,6 +476,7 @@ class ConfigManager:
             raise ValueError("Конфигурация не загружена")
         
         self._config.target_sites[site_name] = site_config
+        self.sites_version += 1
     
     def remove_site_config(self, site_name: str) -> bool:
         """Удаление конфигурации сайта"""
@@ -286,6 +485,7 @@ class ConfigManager:
         
         if site_name in self._config.target_sites:
             del self._config.target_sites[site_name]
+            self.sites_version += 1
             return True
         
         return False
@@ -300,7 +500,7 @@ class ConfigManager:
     def is_ai_enabled(self) -> bool:
         """Проверка включения AI рекомендаций"""
         ai_config = self.get_ai_config()
-        return ai_config.enabled and bool(os.getenv(ai_config.api_key_env))
+        return ai_config.enabled and bool(self._getenv(ai_config.api_key_env))
     
     def get_detection_settings(self) -> DetectionSettings:
         """Получение настроек определения лимитов"""
@@ -316,16 +516,16 @@ class ConfigManager:
         
         # Обновляем AI настройки
         ai_key_env = self._config.ai_recommendations.api_key_env
-        if os.getenv(ai_key_env):
+        if self._getenv(ai_key_env):
             self._config.ai_recommendations.enabled = True
         
         # Обновляем уровень логирования
-        log_level = os.getenv('RATE_LIMIT_LOG_LEVEL')
+        log_level = self._getenv('RATE_LIMIT_LOG_LEVEL')
         if log_level:
             self._config.logging.level = log_level.upper()
         
         # Обновляем настройки сети
-        timeout = os.getenv('RATE_LIMIT_TIMEOUT')
+        timeout = self._getenv('RATE_LIMIT_TIMEOUT')
         if timeout:
             try:
                 self._config.network.timeout = int(timeout)
@@ -339,34 +539,55 @@ class ConfigManager:
         logger.info(f"Шаблон конфигурации экспортирован в {output_path}")
     
     def check_config_compatibility(self, config_path: Path) -> Dict[str, Any]:
-        """Проверка совместимости конфигурации"""
+        """Проверка совместимости конфигурации
+        
+        Читаются только нужные поля исходного JSON, полная pydantic валидация
+        (и замена текущей конфигурации) не выполняется; для нее есть validate_config().
+        Ошибки схемы (неверные типы, URL, значения вне диапазона) здесь не
+        обнаруживаются: такая конфигурация получит compatible=True, но не пройдет
+        load_config(). Отчет явно помечает это полем schema_checked=False.
+        """
         try:
-            config = self.load_config(config_path)
+            config_data = self._read_json_file(config_path)
+            if not isinstance(config_data, dict):
+                raise ValueError("Конфигурация должна быть JSON объектом")
+            
+            # Подстановка переменных окружения, как при load_config
+            config_data = self._substitute_env_vars(config_data)
+            
+            version = config_data.get("version", Config.model_fields["version"].default)
             
             compatibility_report = {
                 "compatible": True,
-                "version": config.version,
+                "schema_checked": False,
+                "version": version,
                 "warnings": [],
                 "errors": []
             }
             
             # Проверяем версию
-            if config.version != "1.0.0":
+            if version != "1.0.0":
                 compatibility_report["warnings"].append(
-                    f"Версия конфигурации {config.version} может быть несовместима с текущей версией"
+                    f"Версия конфигурации {version} может быть несовместима с текущей версией"
                 )
             
             # Проверяем обязательные поля
-            if not config.target_sites:
+            if not config_data.get("target_sites"):
                 compatibility_report["errors"].append("Не указаны целевые сайты")
                 compatibility_report["compatible"] = False
             
+            if not config_data.get("detection_settings"):
+                compatibility_report["errors"].append("Не указаны настройки определения лимитов")
+                compatibility_report["compatible"] = False
+            
             # Проверяем AI настройки
-            if config.ai_recommendations.enabled:
-                api_key = os.getenv(config.ai_recommendations.api_key_env)
+            ai_data = config_data.get("ai_recommendations") or {}
+            if ai_data.get("enabled", AISettings.model_fields["enabled"].default):
+                api_key_env = ai_data.get("api_key_env", AISettings.model_fields["api_key_env"].default)
+                api_key = self._getenv(api_key_env)
                 if not api_key:
                     compatibility_report["warnings"].append(
-                        f"AI рекомендации включены, но не найден API ключ в переменной {config.ai_recommendations.api_key_env}"
+                        f"AI рекомендации включены, но не найден API ключ в переменной {api_key_env}"
                     )
             
             return compatibility_report
@@ -374,6 +595,7 @@ class ConfigManager:
         except Exception as e:
             return {
                 "compatible": False,
+                "schema_checked": False,
                 "version": "unknown",
                 "warnings": [],
                 "errors": [str(e)]
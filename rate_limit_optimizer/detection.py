@@ -5,8 +5,11 @@ import asyncio
 import logging
 import re
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple, Set
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+from itertools import pairwise
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple, Set
 from urllib.parse import urljoin
 import random
 
@@ -21,158 +24,206 @@ from .exceptions import RateLimitExceeded, NetworkError, ServerError
 
 logger = logging.getLogger(__name__)
 
+# Роль и временное окно в имени многоуровневого заголовка, например
+# X-RateLimit-Remaining-Minute, X-RateLimit-Limit-Hours или X-Rate-Limit-Limit-15min.
+# Роль после окна (X-RateLimit-Minute-Remaining) отвергается: иначе "limit"
+# из "ratelimit" принимался бы за роль такого заголовка
+_TIER_HEADER_RE = re.compile(
+    r"(?P<role>limit|remaining|reset)[-_]?"
+    r"(?P<tier>10[-_ ]?s(?:econds?)?|15[-_ ]?min(?:s|utes?)?"
+    r"|minutes?|mins?|60|hours?|hrs?|3600|days?|daily|86400)"
+    r"(?![a-z0-9])(?![-_ ]?(?:limit|remaining|reset))",
+    re.IGNORECASE
+)
+
+_TIER_TO_WINDOW: Dict[str, int] = {
+    "10s": 10, "10second": 10, "10seconds": 10,
+    "minute": 60, "minutes": 60, "min": 60, "mins": 60, "60": 60,
+    "15min": 900, "15mins": 900, "15minute": 900, "15minutes": 900,
+    "hour": 3600, "hours": 3600, "hr": 3600, "hrs": 3600, "3600": 3600,
+    "day": 86400, "days": 86400, "daily": 86400, "86400": 86400,
+}
+
+_TIER_SEPARATORS = str.maketrans("", "", "-_ ")
+
+# Временное окно -> поле MultiTierResult и имя уровня
+_WINDOW_TO_ATTR: Dict[int, str] = {
+    10: "ten_second_limit",
+    60: "minute_limit",
+    900: "fifteen_minute_limit",
+    3600: "hour_limit",
+    86400: "day_limit",
+}
+
+_WINDOW_TO_TIER_NAME: Dict[int, str] = {
+    10: "10_seconds",
+    60: "minute",
+    900: "15_minutes",
+    3600: "hour",
+    86400: "day",
+}
+
+
+# Тела ответов не больше этого размера дочитываются, чтобы сохранить keep-alive соединение
+_DRAIN_BODY_LIMIT = 64 * 1024
+
+# Прерывание тестирования уровня по сглаженной (EWMA) доле 5xx ответов
+_SERVER_ERROR_EWMA_ALPHA = 0.3
+_SERVER_ERROR_EWMA_ABORT = 0.5
+_SERVER_ERROR_MIN_COUNT = 5
+
+
+@lru_cache(maxsize=256)
+def _join(base_url: str, endpoint: str) -> str:
+    """urljoin с кешированием: одни и те же пары base_url/endpoint повторяются между вызовами"""
+    return urljoin(base_url, endpoint)
+
+
+def _reset_time(epoch: Optional[float]) -> Optional[datetime]:
+    """Перевод времени сброса (epoch секунды) в datetime для RateLimit
+    
+    Внутри детектора время считается float-секундами, datetime
+    создается один раз при сборке модели. Значение вне диапазона платформы
+    (например, epoch в миллисекундах) дает None, а не исключение.
+    """
+    if epoch is None:
+        return None
+    try:
+        return datetime.fromtimestamp(epoch)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _parse_uint(value: Optional[str]) -> Optional[int]:
+    """Строгий разбор неотрицательного целого из заголовка
+    
+    Принимает только ASCII-цифры: знаки, пробелы, переводы строк
+    и unicode-цифры, которые допускает int(), отклоняются.
+    """
+    if not value or not value.isascii() or not value.isdigit():
+        return None
+    return int(value)
+
 
 class HeaderAnalyzer:
     """Анализатор заголовков для определения rate limits"""
     
-    def __init__(self):
-        self.rate_limit_headers = [
-            "X-RateLimit-Limit",
-            "X-RateLimit-Remaining", 
-            "X-RateLimit-Reset",
-            "X-RateLimit-Window",
-            "X-Rate-Limit-Limit-Minute",
-            "X-Rate-Limit-Limit-Hour", 
-            "X-Rate-Limit-Limit-Day",
-            "X-Rate-Limit-Remaining-Minute",
-            "X-Rate-Limit-Remaining-Hour",
-            "X-Rate-Limit-Remaining-Day",
-            "X-Rate-Limit-Reset-Minute",
-            "X-Rate-Limit-Reset-Hour",
-            "X-Rate-Limit-Reset-Day",
-            "Retry-After"
-        ]
+    # Известные заголовки rate limit; общие для всех экземпляров
+    rate_limit_headers: FrozenSet[str] = frozenset((
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "X-RateLimit-Window",
+        "X-Rate-Limit-Limit-Minute",
+        "X-Rate-Limit-Limit-Hour",
+        "X-Rate-Limit-Limit-Day",
+        "X-Rate-Limit-Remaining-Minute",
+        "X-Rate-Limit-Remaining-Hour",
+        "X-Rate-Limit-Remaining-Day",
+        "X-Rate-Limit-Reset-Minute",
+        "X-Rate-Limit-Reset-Hour",
+        "X-Rate-Limit-Reset-Day",
+        "Retry-After"
+    ))
     
     def extract_rate_limits(self, headers: Dict[str, str]) -> List[RateLimit]:
         """Извлечение rate limits из заголовков"""
         limits = []
         
+        # Имена приводим к нижнему регистру один раз; X-Rate-Limit-* и X-RateLimit-*
+        # сводим к одному написанию, чтобы искать каждый заголовок одним обращением
+        headers_lc = {
+            key.lower().replace("rate-limit", "ratelimit"): value
+            for key, value in headers.items()
+        }
+        
         # Стандартные заголовки
-        basic_limit = self._extract_basic_limit(headers)
+        basic_limit = self._extract_basic_limit(headers_lc)
         if basic_limit:
             limits.append(basic_limit)
         
         # Многоуровневые заголовки
-        multi_limits = self._extract_multi_tier_limits(headers)
+        multi_limits = self._extract_multi_tier_limits(headers_lc)
         limits.extend(multi_limits)
         
         # Фильтруем дубликаты и некорректные лимиты
         return self._filter_valid_limits(limits)
     
-    def _extract_basic_limit(self, headers: Dict[str, str]) -> Optional[RateLimit]:
-        """Извлечение базового лимита"""
-        limit_str = headers.get("X-RateLimit-Limit") or headers.get("X-Rate-Limit-Limit")
-        remaining_str = headers.get("X-RateLimit-Remaining") or headers.get("X-Rate-Limit-Remaining")
-        reset_str = headers.get("X-RateLimit-Reset") or headers.get("X-Rate-Limit-Reset")
-        window_str = headers.get("X-RateLimit-Window") or headers.get("X-Rate-Limit-Window")
+    def _extract_basic_limit(self, headers_lc: Dict[str, str]) -> Optional[RateLimit]:
+        """Извлечение базового лимита из заголовков с нормализованными именами"""
+        limit_str = headers_lc.get("x-ratelimit-limit")
+        remaining_str = headers_lc.get("x-ratelimit-remaining")
+        reset_str = headers_lc.get("x-ratelimit-reset")
+        window_str = headers_lc.get("x-ratelimit-window")
         
         if not limit_str:
             return None
         
-        try:
-            limit = int(limit_str)
-            remaining = int(remaining_str) if remaining_str else limit
-            
-            # Определяем время сброса
-            reset_time = None
-            if reset_str:
-                try:
-                    # Пробуем как timestamp
-                    reset_timestamp = int(reset_str)
-                    reset_time = datetime.fromtimestamp(reset_timestamp)
-                except ValueError:
-                    # Пробуем как секунды до сброса
-                    try:
-                        seconds_until_reset = int(reset_str)
-                        reset_time = datetime.now() + timedelta(seconds=seconds_until_reset)
-                    except ValueError:
-                        pass
-            
-            # Определяем временное окно
-            window_seconds = 60  # По умолчанию минута
-            if window_str:
-                try:
-                    window_seconds = int(window_str)
-                except ValueError:
-                    pass
-            
-            return RateLimit(
-                limit=limit,
-                remaining=remaining,
-                reset_time=reset_time,
-                window_seconds=window_seconds,
-                detected_via=DetectionMethod.HEADERS
-            )
-            
-        except (ValueError, TypeError) as e:
-            logger.warning(f"Ошибка парсинга базового лимита: {e}")
+        limit = _parse_uint(limit_str)
+        remaining = _parse_uint(remaining_str) if remaining_str else limit
+        if not limit or remaining is None:
+            logger.warning("Ошибка парсинга базового лимита: %r/%r", limit_str, remaining_str)
             return None
-    
-    def _extract_multi_tier_limits(self, headers: Dict[str, str]) -> List[RateLimit]:
-        """Извлечение многоуровневых лимитов"""
-        limits = []
         
-        # Паттерны для различных временных окон
-        tier_patterns = {
-            "10s": (10, ["10s", "10_seconds", "10-seconds"]),
-            "minute": (60, ["minute", "min", "60"]),
-            "15min": (900, ["15min", "15_minutes", "15-minutes"]),
-            "hour": (3600, ["hour", "hr", "3600"]),
-            "day": (86400, ["day", "daily", "86400"])
-        }
+        # Определяем временное окно, по умолчанию минута
+        window_seconds = _parse_uint(window_str)
         
-        for tier_name, (window_seconds, patterns) in tier_patterns.items():
-            limit = self._extract_tier_limit(headers, patterns, window_seconds)
-            if limit:
-                limits.append(limit)
-        
-        return limits
+        return RateLimit(
+            limit=limit,
+            remaining=remaining,
+            reset_time=_reset_time(_parse_uint(reset_str)),
+            window_seconds=window_seconds or 60,
+            detected_via=DetectionMethod.HEADERS,
+            window_from_server=bool(window_seconds)
+        )
     
-    def _extract_tier_limit(self, headers: Dict[str, str], patterns: List[str], window_seconds: int) -> Optional[RateLimit]:
-        """Извлечение лимита для конкретного уровня"""
-        limit_value = None
-        remaining_value = None
-        reset_time = None
+    def _extract_multi_tier_limits(self, headers_lc: Dict[str, str]) -> List[RateLimit]:
+        """Извлечение многоуровневых лимитов
         
-        # Ищем заголовки с паттернами
-        for header_name, header_value in headers.items():
-            header_lower = header_name.lower()
+        Каждый заголовок классифицируется один раз (роль + временное окно),
+        после чего лимиты собираются из небольшой таблицы по окнам.
+        """
+        per_tier: Dict[int, Dict[str, Any]] = {}
+        
+        for header_name, header_value in headers_lc.items():
+            match = _TIER_HEADER_RE.search(header_name)
+            if match is None:
+                continue
+            
+            role = match.group("role")
+            window_seconds = _TIER_TO_WINDOW[match.group("tier").translate(_TIER_SEPARATORS)]
+            
+            value = _parse_uint(header_value)
+            if value is None:
+                continue
             
-            # Проверяем паттерны в имени заголовка
-            for pattern in patterns:
-                if pattern.lower() in header_lower:
-                    if "limit" in header_lower and "remaining" not in header_lower:
-                        try:
-                            limit_value = int(header_value)
-                        except ValueError:
-                            continue
-                    elif "remaining" in header_lower:
-                        try:
-                            remaining_value = int(header_value)
-                        except ValueError:
-                            continue
-                    elif "reset" in header_lower:
-                        try:
-                            reset_timestamp = int(header_value)
-                            reset_time = datetime.fromtimestamp(reset_timestamp)
-                        except ValueError:
-                            continue
-        
-        if limit_value is not None:
-            return RateLimit(
+            per_tier.setdefault(window_seconds, {})[role] = value
+        
+        limits = []
+        for window_seconds in sorted(per_tier):
+            values = per_tier[window_seconds]
+            limit_value = values.get("limit")
+            if not limit_value:
+                continue
+            
+            limits.append(RateLimit(
                 limit=limit_value,
-                remaining=remaining_value if remaining_value is not None else limit_value,
-                reset_time=reset_time,
+                remaining=values.get("remaining", limit_value),
+                reset_time=_reset_time(values.get("reset")),
                 window_seconds=window_seconds,
                 detected_via=DetectionMethod.HEADERS
-            )
+            ))
         
-        return None
+        return limits
     
     def _filter_valid_limits(self, limits: List[RateLimit]) -> List[RateLimit]:
-        """Фильтрация валидных лимитов"""
-        valid_limits = []
-        seen_windows = set()
+        """Фильтрация валидных лимитов
+        
+        Для каждого временного окна остается первый найденный лимит:
+        базовые заголовки имеют приоритет над многоуровневыми, кроме случая,
+        когда окно базового лимита не указано сервером, а принято по умолчанию.
+        """
+        by_window: Dict[int, RateLimit] = {}
         
         for limit in limits:
             # Проверяем корректность значений
@@ -185,19 +236,30 @@ class HeaderAnalyzer:
                 limit.remaining = limit.limit
             
             # Избегаем дубликатов по временному окну
-            if limit.window_seconds not in seen_windows:
-                valid_limits.append(limit)
-                seen_windows.add(limit.window_seconds)
+            current = by_window.get(limit.window_seconds)
+            if current is None or (limit.window_from_server and not current.window_from_server):
+                by_window[limit.window_seconds] = limit
         
-        return valid_limits
+        return list(by_window.values())
 
 
 class TierTester:
     """Тестировщик отдельного уровня rate limit"""
     
-    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        max_inflight: int = 64,
+        header_analyzer: Optional[HeaderAnalyzer] = None,
+        use_head: bool = False
+    ):
         self.session = session
         self._should_close_session = session is None
+        # Максимум одновременных запросов внутри батча
+        self.max_inflight = max_inflight
+        self.header_analyzer = header_analyzer or HeaderAnalyzer()
+        # HEAD не загружает тело ответа; при 405/501 автоматически переходим на GET
+        self.request_method = "HEAD" if use_head else "GET"
     
     async def __aenter__(self):
         if not self.session:
@@ -231,9 +293,10 @@ class TierTester:
     ) -> TierTestResult:
         """Внутренняя реализация тестирования уровня"""
         
-        logger.info(f"Начинаем тестирование tier '{tier.name}' для {url}")
+        logger.info("Начинаем тестирование tier '%s' для %s", tier.name, url)
         
-        start_time = time.time()
+        _now = time.monotonic
+        start_time = _now()
         requests_sent = 0
         successful_requests = 0
         server_errors = 0
@@ -243,14 +306,16 @@ class TierTester:
         retry_after_seconds = None
         final_rate_when_limited = None
         adaptive_increments_used = 0
-        error_details = ""
+        error_details: List[str] = []
         retry_reasons = []
+        # Сглаженная доля 5xx по батчам
+        server_error_ewma = 0.0
         
         test_duration = tier.test_duration_seconds
         end_time = start_time + test_duration
         
-        while time.time() < end_time and current_rate <= tier.max_rate:
-            batch_start = time.time()
+        while _now() < end_time and current_rate <= tier.max_rate:
+            batch_start = _now()
             
             # Отправляем запросы с текущей частотой
             batch_results = await self._send_request_batch(
@@ -261,6 +326,7 @@ class TierTester:
             
             # Анализируем результаты батча
             rate_limited = False
+            batch_server_errors = server_errors
             for result in batch_results:
                 if result['success']:
                     successful_requests += 1
@@ -271,13 +337,13 @@ class TierTester:
                     retry_after_seconds = result.get('retry_after')
                     final_rate_when_limited = current_rate
                     
-                    logger.info(f"Rate limit обнаружен на частоте {current_rate} req/{tier.window_seconds}s")
+                    logger.info("Rate limit обнаружен на частоте %d req/%ds", current_rate, tier.window_seconds)
                     break
                 elif result['status_code'] >= 500:
                     server_errors += 1
-                    error_details += f"Server error {result['status_code']}; "
+                    error_details.append(f"Server error {result['status_code']}")
                 else:
-                    error_details += f"Error {result['status_code']}; "
+                    error_details.append(f"Error {result['status_code']}")
             
             if rate_limited:
                 # Применяем backoff если указан retry_after
@@ -287,26 +353,34 @@ class TierTester:
                     await asyncio.sleep(min(retry_after_seconds, 10))  # Максимум 10 секунд для тестов
                 break
             
-            # Увеличиваем частоту для следующей итерации
-            if tier.adaptive_increment:
-                # Адаптивное увеличение на основе успешности
-                success_rate = successful_requests / requests_sent if requests_sent > 0 else 1.0
-                if success_rate > 0.95:
-                    increment = tier.increment * 2  # Агрессивнее если все хорошо
-                    adaptive_increments_used += 1
-                else:
-                    increment = tier.increment
-            else:
-                increment = tier.increment
+            # Прекращаем тест, если сервер стабильно отвечает 5xx: дальнейший рост частоты только усилит нагрузку
+            if batch_results:
+                batch_server_error_rate = (server_errors - batch_server_errors) / len(batch_results)
+                server_error_ewma = (
+                    _SERVER_ERROR_EWMA_ALPHA * batch_server_error_rate
+                    + (1 - _SERVER_ERROR_EWMA_ALPHA) * server_error_ewma
+                )
+                if server_error_ewma > _SERVER_ERROR_EWMA_ABORT and server_errors > _SERVER_ERROR_MIN_COUNT:
+                    logger.warning(
+                        "Тестирование tier '%s' прервано: доля 5xx %.0f%% на частоте %d req/%ds",
+                        tier.name, server_error_ewma * 100, current_rate, tier.window_seconds
+                    )
+                    error_details.append("Aborted on 5xx EWMA")
+                    break
             
-            current_rate += increment
+            # Увеличиваем частоту для следующей итерации; при адаптивном
+            # режиме и успешности выше 95% шаг удваивается
+            success_rate = successful_requests / requests_sent if requests_sent > 0 else 1.0
+            factor = 2 if (tier.adaptive_increment and success_rate > 0.95) else 1
+            current_rate += tier.increment * factor
+            adaptive_increments_used += factor == 2
             
             # Ждем до конца временного окна если нужно
-            batch_duration = time.time() - batch_start
+            batch_duration = _now() - batch_start
             if batch_duration < tier.window_seconds:
                 await asyncio.sleep(tier.window_seconds - batch_duration)
         
-        total_duration = time.time() - start_time
+        total_duration = _now() - start_time
         error_rate = (requests_sent - successful_requests) / requests_sent if requests_sent > 0 else 0
         
         result = TierTestResult(
@@ -323,11 +397,11 @@ class TierTester:
             final_rate_when_limited=final_rate_when_limited,
             adaptive_increments_used=adaptive_increments_used,
             server_errors=server_errors,
-            error_details=error_details.strip(),
+            error_details="; ".join(error_details),
             retry_reasons=retry_reasons
         )
         
-        logger.info(f"Тестирование tier '{tier.name}' завершено: {result.limit_found}")
+        logger.info("Тестирование tier '%s' завершено: %s", tier.name, result.limit_found)
         return result
     
     async def _send_request_batch(
@@ -337,72 +411,121 @@ class TierTester:
         window_seconds: int, 
         headers: Optional[Dict[str, str]] = None
     ) -> List[Dict[str, Any]]:
-        """Отправка батча запросов с заданной частотой"""
+        """Отправка батча запросов с заданной частотой
+        
+        Запросы планируются на общую временную шкалу (i * interval от начала батча)
+        и выполняются параллельно, поэтому медленные ответы не сдвигают расписание.
+        Первый 429 завершает TaskGroup: остальные запросы, в том числе
+        уже отправленные, отменяются, а их соединения возвращаются в пул.
+        """
         
-        results = []
         interval = window_seconds / rate if rate > 0 else 1.0
+        loop = asyncio.get_running_loop()
+        batch_start = loop.time()
+        inflight = asyncio.Semaphore(self.max_inflight)
+        # Результаты в порядке получения ответов
+        results: List[Dict[str, Any]] = []
+        
+        async def send_at(index: int) -> None:
+            delay = batch_start + index * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            async with inflight:
+                result = await self._send_request(url, headers)
+            
+            results.append(result)
+            
+            # Если получили 429, прекращаем батч
+            if result['status_code'] == 429:
+                raise RateLimitExceeded(f"429 от {url}", retry_after=result.get('retry_after'))
         
-        for i in range(rate):
-            try:
-                start_time = time.time()
-                
-                async with self.session.get(url, headers=headers) as response:
-                    response_time = time.time() - start_time
-                    
-                    # Извлекаем retry_after если есть
-                    retry_after = None
-                    if response.status == 429:
-                        retry_after_header = response.headers.get('Retry-After')
-                        if retry_after_header:
-                            try:
-                                retry_after = int(retry_after_header)
-                            except ValueError:
-                                pass
-                    
-                    result = {
-                        'success': response.status == 200,
-                        'status_code': response.status,
-                        'response_time': response_time,
-                        'headers': dict(response.headers),
-                        'retry_after': retry_after
-                    }
-                    
-                    results.append(result)
-                    
-                    # Если получили 429, прекращаем батч
-                    if response.status == 429:
-                        break
-                
-                # Ждем интервал между запросами (кроме последнего)
-                if i < rate - 1:
-                    await asyncio.sleep(interval)
-                    
-            except asyncio.TimeoutError:
-                results.append({
-                    'success': False,
-                    'status_code': 0,
-                    'response_time': 30.0,
-                    'headers': {},
-                    'error': 'timeout'
-                })
-            except ClientError as e:
-                results.append({
-                    'success': False,
-                    'status_code': 0,
-                    'response_time': 0,
-                    'headers': {},
-                    'error': str(e)
-                })
+        try:
+            async with asyncio.TaskGroup() as group:
+                for index in range(rate):
+                    group.create_task(send_at(index))
+        except* RateLimitExceeded:
+            logger.debug("Батч из %d запросов прерван после %d ответов", rate, len(results))
         
         return results
     
+    async def _send_request(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Отправка одного запроса и сбор результата"""
+        
+        try:
+            result = await self._request(self.request_method, url, headers)
+            
+            # Сервер не поддерживает HEAD: переключаемся на GET до конца теста
+            if self.request_method == "HEAD" and result['status_code'] in (405, 501):
+                logger.info("HEAD не поддерживается для %s, используем GET", url)
+                self.request_method = "GET"
+                result = await self._request("GET", url, headers)
+            
+            return result
+                
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'status_code': 0,
+                'response_time': 30.0,
+                'headers': None,
+                'error': 'timeout'
+            }
+        except ClientError as e:
+            return {
+                'success': False,
+                'status_code': 0,
+                'response_time': 0,
+                'headers': None,
+                'error': str(e)
+            }
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Выполнение запроса; тело читается только если оно небольшое"""
+        
+        start_time = time.monotonic()
+        
+        async with self.session.request(method, url, headers=headers) as response:
+            response_time = time.monotonic() - start_time
+            
+            # Заголовки копируем только для 429: остальные ответы их не используют
+            response_headers = None
+            retry_after = None
+            if response.status == 429:
+                response_headers = dict(response.headers)
+                retry_after = _parse_uint(response.headers.get('Retry-After'))
+            
+            # Тело не нужно, но недочитанный ответ aiohttp закрывает вместе с
+            # соединением. Небольшое тело дочитываем, чтобы соединение вернулось
+            # в keep-alive пул общей сессии; большое или неизвестной длины дешевле
+            # оборвать вместе с соединением при выходе из контекста
+            content_length = response.content_length
+            if content_length is not None and content_length <= _DRAIN_BODY_LIMIT:
+                await response.read()
+            
+            return {
+                'success': response.status == 200,
+                'status_code': response.status,
+                'response_time': response_time,
+                'headers': response_headers,
+                'retry_after': retry_after
+            }
+    
     def _extract_limit_from_response(self, response_result: Dict[str, Any], window_seconds: int) -> RateLimit:
         """Извлечение лимита из ответа с ошибкой 429"""
-        headers = response_result.get('headers', {})
+        headers = response_result.get('headers') or {}
         
         # Пробуем извлечь лимит из заголовков
-        analyzer = HeaderAnalyzer()
-        limits = analyzer.extract_rate_limits(headers)
+        limits = self.header_analyzer.extract_rate_limits(headers)
         
         # Ищем лимит с подходящим временным окном
         for limit in limits:
@@ -410,31 +533,24 @@ class TierTester:
                 return limit
         
         # Если не нашли в заголовках, создаем на основе тестирования
-        limit_value = None
         remaining_value = 0
         
         # Пробуем извлечь из стандартных заголовков
         limit_header = headers.get('X-RateLimit-Limit') or headers.get('X-Rate-Limit-Limit')
-        if limit_header:
-            try:
-                limit_value = int(limit_header)
-            except ValueError:
-                pass
+        limit_value = _parse_uint(limit_header)
         
-        # Если не нашли, используем приблизительное значение
-        if limit_value is None:
+        # Если не нашли (или лимит нулевой), используем приблизительное значение
+        if not limit_value:
             # Предполагаем что лимит немного меньше текущей частоты
             limit_value = max(1, response_result.get('current_rate', 10) - 1)
         
-        reset_time = None
         retry_after = response_result.get('retry_after')
-        if retry_after:
-            reset_time = datetime.now() + timedelta(seconds=retry_after)
+        reset_epoch = time.time() + retry_after if retry_after else None
         
         return RateLimit(
             limit=limit_value,
             remaining=remaining_value,
-            reset_time=reset_time,
+            reset_time=_reset_time(reset_epoch),
             window_seconds=window_seconds,
             detected_via=DetectionMethod.TESTING
         )
@@ -443,9 +559,71 @@ class TierTester:
 class MultiTierDetector:
     """Детектор многоуровневых rate limits"""
     
-    def __init__(self, strategy: Optional[Any] = None):
+    def __init__(self, strategy: Optional[Any] = None, use_head: bool = False, keep_session: bool = False):
         self.strategy = strategy
+        self.use_head = use_head
         self.header_analyzer = HeaderAnalyzer()
+        # Общая сессия для анализа заголовков и тестирования уровней.
+        # Без keep_session (или async with) она закрывается после последнего
+        # активного вызова detect_*/test_*; иначе - только в aclose()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._keep_session = keep_session
+        self._active_calls = 0
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание общей HTTP сессии с пулом keep-alive соединений"""
+        
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=256,
+                limit_per_host=64,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=ClientTimeout(total=30)
+            )
+        
+        return self._session
+    
+    async def aclose(self) -> None:
+        """Закрытие общей HTTP сессии"""
+        
+        if self._session:
+            await self._session.close()
+            self._session = None
+    
+    async def __aenter__(self):
+        self._keep_session = True
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._keep_session = False
+        await self.aclose()
+    
+    @asynccontextmanager
+    async def _session_scope(self):
+        """Область использования сессии публичным методом
+        
+        Вложенные и параллельные вызовы делят одну сессию; она закрывается,
+        когда завершился последний из них и детектор не удерживает ее.
+        """
+        self._active_calls += 1
+        try:
+            yield
+        finally:
+            self._active_calls -= 1
+            if not self._active_calls and not self._keep_session:
+                await self.aclose()
+    
+    async def _create_tier_tester(self) -> TierTester:
+        """Создание тестировщика уровня на общей сессии"""
+        return TierTester(
+            session=await self._get_session(),
+            header_analyzer=self.header_analyzer,
+            use_head=self.use_head
+        )
     
     async def detect_all_rate_limits(
         self,
@@ -454,17 +632,51 @@ class MultiTierDetector:
         headers: Optional[Dict[str, str]] = None,
         tiers_to_test: Optional[List[RateLimitTier]] = None,
         validate_consistency: bool = False,
-        resolve_dependencies: bool = False
+        resolve_dependencies: bool = False,
+        force_test: bool = False
     ) -> MultiTierResult:
-        """Определение всех уровней rate limits"""
+        """Определение всех уровней rate limits
+        
+        Уровни, окно которых сервер явно указал в заголовках, не тестируются,
+        если не передан force_test=True. Окно, принятое по умолчанию (только
+        X-RateLimit-Limit без X-RateLimit-Window), тестирование не отменяет.
+        """
         
-        logger.info(f"Начинаем определение rate limits для {base_url}{endpoint}")
+        url = _join(base_url, endpoint)
+        async with self._session_scope():
+            return await self._detect_all_rate_limits(
+                base_url, endpoint, [url], headers, tiers_to_test, validate_consistency, force_test
+            )
+    
+    async def _detect_all_rate_limits(
+        self,
+        base_url: str,
+        endpoint: str,
+        header_urls: List[str],
+        headers: Optional[Dict[str, str]] = None,
+        tiers_to_test: Optional[List[RateLimitTier]] = None,
+        validate_consistency: bool = False,
+        force_test: bool = False
+    ) -> MultiTierResult:
+        """Определение лимитов: заголовки всех header_urls, тестирование уровней на первом из них"""
         
-        start_time = time.time()
-        url = urljoin(base_url, endpoint)
+        logger.info("Начинаем определение rate limits для %s%s", base_url, endpoint)
+        
+        start_time = time.monotonic()
+        url = header_urls[0]
         
         # Сначала пробуем анализ заголовков
-        header_limits = await self._analyze_headers(url, headers)
+        header_limits = await self._analyze_headers_many(header_urls, headers)
+        
+        # Уровни, явно указанные сервером в заголовках, повторно не тестируем
+        if tiers_to_test and header_limits and not force_test:
+            known_windows = {
+                limit.window_seconds for limit in header_limits if limit.window_from_server
+            }
+            skipped = [tier.name for tier in tiers_to_test if tier.window_seconds in known_windows]
+            if skipped:
+                logger.info("Пропускаем тестирование уровней, найденных в заголовках: %s", ", ".join(skipped))
+                tiers_to_test = [tier for tier in tiers_to_test if tier.window_seconds not in known_windows]
         
         # Если заголовки не дали полной информации, переходим к тестированию
         tested_limits = []
@@ -474,11 +686,8 @@ class MultiTierDetector:
         # Объединяем результаты
         all_limits = header_limits + [result.detected_limit for result in tested_limits if result.detected_limit]
         
-        # Определяем самый строгий лимит
-        most_restrictive = self._find_most_restrictive_limit(all_limits)
-        
-        # Рассчитываем рекомендуемую частоту
-        recommended_rate = self._calculate_recommended_rate(all_limits, most_restrictive)
+        # Определяем самый строгий лимит и рекомендуемую частоту
+        most_restrictive, recommended_rate = self._summarize(all_limits)
         
         # Собираем результат
         result = MultiTierResult(
@@ -489,7 +698,7 @@ class MultiTierDetector:
             recommended_rate=recommended_rate,
             limits_found=len(all_limits),
             total_requests=sum(r.requests_sent for r in tested_limits),
-            test_duration_seconds=time.time() - start_time,
+            test_duration_seconds=time.monotonic() - start_time,
             tier_results=tested_limits,
             endpoints_tested=[endpoint],
             confidence_score=0.8  # Базовая уверенность
@@ -502,28 +711,68 @@ class MultiTierDetector:
         if validate_consistency:
             result.consistency_warnings = self._validate_consistency(all_limits)
         
-        logger.info(f"Определение завершено: найдено {len(all_limits)} лимитов")
+        logger.info("Определение завершено: найдено %d лимитов", len(all_limits))
         return result
     
     async def _analyze_headers(self, url: str, headers: Optional[Dict[str, str]] = None) -> List[RateLimit]:
         """Анализ заголовков для быстрого определения лимитов"""
         
         try:
-            timeout = ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, headers=headers) as response:
-                    response_headers = dict(response.headers)
-                    
-                    limits = self.header_analyzer.extract_rate_limits(response_headers)
-                    
-                    if limits:
-                        logger.info(f"Найдено {len(limits)} лимитов в заголовках")
-                    
-                    return limits
-                    
+            session = await self._get_session()
+            async with session.get(url, headers=headers, timeout=ClientTimeout(total=10)) as response:
+                response_headers = dict(response.headers)
         except Exception as e:
-            logger.warning(f"Ошибка анализа заголовков: {e}")
+            logger.warning("Ошибка анализа заголовков: %s", e)
             return []
+        
+        # Разбор вне обработчика сетевых ошибок: некорректные поля пропускаются
+        # самим анализатором и не отбрасывают остальные заголовки
+        limits = self.header_analyzer.extract_rate_limits(response_headers)
+        
+        if limits:
+            logger.info("Найдено %d лимитов в заголовках", len(limits))
+        
+        return limits
+    
+    async def _analyze_headers_many(
+        self,
+        urls: List[str],
+        headers: Optional[Dict[str, str]] = None,
+        max_concurrent: int = 4
+    ) -> List[RateLimit]:
+        """Параллельный анализ заголовков нескольких URL
+        
+        Число одновременных запросов ограничено, чтобы сама проверка
+        не упиралась в измеряемый лимит. Для каждого временного окна
+        остается самый строгий из найденных лимитов.
+        """
+        
+        if len(urls) == 1:
+            return await self._analyze_headers(urls[0], headers)
+        
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def analyze_with_semaphore(url: str) -> List[RateLimit]:
+            async with semaphore:
+                return await self._analyze_headers(url, headers)
+        
+        results = await asyncio.gather(
+            *(analyze_with_semaphore(url) for url in urls),
+            return_exceptions=True
+        )
+        
+        by_window: Dict[int, RateLimit] = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning("Ошибка анализа заголовков: %s", result)
+                continue
+            
+            for limit in result:
+                current = by_window.get(limit.window_seconds)
+                if current is None or limit.limit < current.limit:
+                    by_window[limit.window_seconds] = limit
+        
+        return list(by_window.values())
     
     async def _test_tiers(
         self, 
@@ -535,87 +784,63 @@ class MultiTierDetector:
         
         results = []
         
-        async with TierTester() as tester:
-            for tier in tiers:
-                try:
-                    result = await tester.test_tier(url, tier, headers)
-                    results.append(result)
+        tester = await self._create_tier_tester()
+        for tier in tiers:
+            try:
+                result = await tester.test_tier(url, tier, headers)
+                results.append(result)
+                
+                # Если нашли лимит и стратегия требует остановки
+                if result.limit_found and getattr(self.strategy, 'stop_on_first_limit', False):
+                    logger.info("Остановка тестирования после первого найденного лимита")
+                    break
                     
-                    # Если нашли лимит и стратегия требует остановки
-                    if result.limit_found and getattr(self.strategy, 'stop_on_first_limit', False):
-                        logger.info("Остановка тестирования после первого найденного лимита")
-                        break
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка тестирования tier {tier.name}: {e}")
-                    # Создаем результат с ошибкой
-                    error_result = TierTestResult(
-                        tier_name=tier.name,
-                        limit_found=False,
-                        requests_sent=0,
-                        successful_requests=0,
-                        error_rate=1.0,
-                        average_response_time=0,
-                        test_duration_seconds=0,
-                        error_details=str(e)
-                    )
-                    results.append(error_result)
+            except Exception as e:
+                logger.error("Ошибка тестирования tier %s: %s", tier.name, e)
+                # Создаем результат с ошибкой
+                error_result = TierTestResult(
+                    tier_name=tier.name,
+                    limit_found=False,
+                    requests_sent=0,
+                    successful_requests=0,
+                    error_rate=1.0,
+                    average_response_time=0,
+                    test_duration_seconds=0,
+                    error_details=str(e)
+                )
+                results.append(error_result)
         
         return results
     
-    def _find_most_restrictive_limit(self, limits: List[RateLimit]) -> str:
-        """Определение самого строгого лимита"""
+    def _summarize(self, limits: List[RateLimit]) -> Tuple[str, int]:
+        """Самый строгий лимит и рекомендуемая частота за один проход"""
         if not limits:
-            return "unknown"
-        
-        # Вычисляем requests per second для каждого лимита
-        min_rps = float('inf')
-        most_restrictive = "unknown"
-        
-        tier_names = {
-            10: "10_seconds",
-            60: "minute", 
-            900: "15_minutes",
-            3600: "hour",
-            86400: "day"
-        }
+            return "unknown", 1
         
+        # Ищем лимит с минимальным requests per second
+        min_limit = limits[0]
+        min_rps = min_limit.requests_per_second
         for limit in limits:
             rps = limit.requests_per_second
             if rps < min_rps:
                 min_rps = rps
-                most_restrictive = tier_names.get(limit.window_seconds, f"{limit.window_seconds}s")
+                min_limit = limit
         
-        return most_restrictive
-    
-    def _calculate_recommended_rate(self, limits: List[RateLimit], most_restrictive: str) -> int:
-        """Расчет рекомендуемой частоты запросов"""
-        if not limits:
-            return 1
-        
-        # Находим самый строгий лимит
-        min_limit = min(limits, key=lambda l: l.requests_per_second)
+        most_restrictive = _WINDOW_TO_TIER_NAME.get(min_limit.window_seconds, f"{min_limit.window_seconds}s")
         
         # Применяем safety margin 10%
         safety_margin = 0.9
         recommended = int(min_limit.limit * safety_margin)
         
-        return max(1, recommended)
+        return most_restrictive, max(1, recommended)
     
     def _assign_limits_to_tiers(self, result: MultiTierResult, limits: List[RateLimit]) -> None:
         """Распределение лимитов по уровням в результате"""
         
         for limit in limits:
-            if limit.window_seconds == 10:
-                result.ten_second_limit = limit
-            elif limit.window_seconds == 60:
-                result.minute_limit = limit
-            elif limit.window_seconds == 900:
-                result.fifteen_minute_limit = limit
-            elif limit.window_seconds == 3600:
-                result.hour_limit = limit
-            elif limit.window_seconds == 86400:
-                result.day_limit = limit
+            attr = _WINDOW_TO_ATTR.get(limit.window_seconds)
+            if attr:
+                setattr(result, attr, limit)
     
     def _validate_consistency(self, limits: List[RateLimit]) -> List[str]:
         """Валидация консистентности между лимитами"""
@@ -627,10 +852,7 @@ class MultiTierDetector:
         # Сортируем по временному окну
         sorted_limits = sorted(limits, key=lambda l: l.window_seconds)
         
-        for i in range(len(sorted_limits) - 1):
-            current = sorted_limits[i]
-            next_limit = sorted_limits[i + 1]
-            
+        for current, next_limit in pairwise(sorted_limits):
             # Проверяем что более длинные окна имеют пропорционально большие лимиты
             current_rps = current.requests_per_second
             next_rps = next_limit.requests_per_second
@@ -651,13 +873,17 @@ class MultiTierDetector:
         headers: Optional[Dict[str, str]] = None,
         rotation_interval: int = 3
     ) -> MultiTierResult:
-        """Определение лимитов с ротацией endpoints"""
+        """Определение лимитов с ротацией endpoints
+        
+        Заголовки всех endpoints анализируются параллельно,
+        основным считается первый endpoint.
+        """
         
-        # Для простоты используем первый endpoint
-        # В полной реализации здесь была бы логика ротации
         primary_endpoint = endpoints[0] if endpoints else "/v1/test"
+        urls = [_join(base_url, endpoint) for endpoint in endpoints] or [_join(base_url, primary_endpoint)]
         
-        result = await self.detect_all_rate_limits(base_url, primary_endpoint, headers)
+        async with self._session_scope():
+            result = await self._detect_all_rate_limits(base_url, primary_endpoint, urls, headers)
         result.endpoints_tested = endpoints
         
         return result
@@ -671,9 +897,10 @@ class MultiTierDetector:
     ) -> TierTestResult:
         """Тестирование одного уровня"""
         
-        url = urljoin(base_url, endpoint)
+        url = _join(base_url, endpoint)
         
-        async with TierTester() as tester:
+        async with self._session_scope():
+            tester = await self._create_tier_tester()
             return await tester.test_tier(url, tier, headers)
     
     async def test_tiers_parallel(
@@ -686,19 +913,20 @@ class MultiTierDetector:
     ) -> MultiTierResult:
         """Параллельное тестирование нескольких уровней"""
         
-        url = urljoin(base_url, endpoint)
+        url = _join(base_url, endpoint)
         
         # Ограничиваем количество параллельных тестов
         semaphore = asyncio.Semaphore(max_concurrent)
         
         async def test_tier_with_semaphore(tier: RateLimitTier) -> TierTestResult:
             async with semaphore:
-                async with TierTester() as tester:
-                    return await tester.test_tier(url, tier, headers)
+                tester = await self._create_tier_tester()
+                return await tester.test_tier(url, tier, headers)
         
         # Запускаем параллельные тесты
         tasks = [test_tier_with_semaphore(tier) for tier in tiers]
-        tier_results = await asyncio.gather(*tasks, return_exceptions=True)
+        async with self._session_scope():
+            tier_results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Фильтруем успешные результаты
         valid_results = []
@@ -706,12 +934,11 @@ class MultiTierDetector:
             if isinstance(result, TierTestResult):
                 valid_results.append(result)
             else:
-                logger.error(f"Ошибка параллельного тестирования: {result}")
+                logger.error("Ошибка параллельного тестирования: %s", result)
         
         # Собираем общий результат
         all_limits = [r.detected_limit for r in valid_results if r.detected_limit]
-        most_restrictive = self._find_most_restrictive_limit(all_limits)
-        recommended_rate = self._calculate_recommended_rate(all_limits, most_restrictive)
+        most_restrictive, recommended_rate = self._summarize(all_limits)
         
         result = MultiTierResult(
             timestamp=datetime.now(),
@@ -751,6 +978,10 @@ class RateLimitDetector:
     def __init__(self):
         self.multi_tier_detector = MultiTierDetector()
     
+    async def aclose(self) -> None:
+        """Закрытие HTTP сессии детектора"""
+        await self.multi_tier_detector.aclose()
+    
     async def detect_rate_limit(
         self,
         base_url: str,
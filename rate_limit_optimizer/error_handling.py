@@ -3,24 +3,96 @@
 """
 import asyncio
 import logging
+import math
 import random
 import time
-from datetime import datetime, timedelta
+import weakref
+from array import array
 from typing import Dict, List, Optional, Any, Callable, Type
-from enum import Enum
+from enum import Enum, IntEnum
 
 import aiohttp
 from aiohttp import ClientError
 
 from .models import (
-    RetryPolicy, RequestError, RetryResult, ErrorStats, CircuitBreakerState
+    RetryPolicy, RequestError, RetryResult, RetryReason, ErrorStats, CircuitBreakerState, JitterMode
 )
 from .exceptions import (
-    RateLimitExceeded, NetworkError, ServerError, AuthenticationError
+    RateLimitExceeded, NetworkError, ServerError, AuthenticationError,
+    CircuitBreakerOpen, CircuitBreakerHalfOpenLimit
 )
 
 logger = logging.getLogger(__name__)
 
+# Решение о повторе по типу исключения; None - решает policy.retry_on_timeout
+_RETRY_DECISIONS: Dict[type, Optional[bool]] = {
+    RateLimitExceeded: True,
+    ServerError: True,
+    NetworkError: True,
+    asyncio.TimeoutError: None,
+    aiohttp.ServerTimeoutError: None,
+    AuthenticationError: False,
+    # Отказ circuit breaker повторять бессмысленно до recovery_timeout
+    CircuitBreakerOpen: False,
+    CircuitBreakerHalfOpenLimit: False,
+}
+
+
+class ErrorBucket(IntEnum):
+    """Индексы счетчиков ErrorHandler (порядок совпадает с полями ErrorStats)"""
+    TOTAL = 0
+    SUCCESS = 1
+    RATE_LIMIT = 2
+    SERVER = 3
+    NETWORK = 4
+    TIMEOUT = 5
+    OTHER = 6
+
+
+# Счетчик ErrorStats по типу исключения
+_EXC_BUCKET: Dict[type, ErrorBucket] = {
+    RateLimitExceeded: ErrorBucket.RATE_LIMIT,
+    ServerError: ErrorBucket.SERVER,
+    NetworkError: ErrorBucket.NETWORK,
+    asyncio.TimeoutError: ErrorBucket.TIMEOUT,
+    aiohttp.ServerTimeoutError: ErrorBucket.TIMEOUT,
+}
+
+_MISSING = object()
+
+# Единый источник случайных чисел для jitter: равномерное значение в [0, 1)
+_unit_random = random.random
+
+
+async def _passthrough(func: Callable, *args, **kwargs) -> Any:
+    """Вызов функции без circuit breaker"""
+    return await func(*args, **kwargs)
+
+
+def _noop(*args, **kwargs) -> None:
+    """Заглушка для отключенного сбора статистики"""
+
+
+def _lookup_by_type(table: Dict[type, Any], exception: BaseException, default: Any = _MISSING) -> Any:
+    """Поиск значения по типу исключения с учетом наследования
+    
+    Результат прохода по MRO (в том числе default) запоминается в table
+    под точным типом исключения, поэтому повторные поиски - один dict lookup.
+    """
+    exc_type = type(exception)
+    try:
+        return table[exc_type]
+    except KeyError:
+        pass
+    
+    value = default
+    for cls in exc_type.__mro__[1:]:
+        if cls in table:
+            value = table[cls]
+            break
+    table[exc_type] = value
+    return value
+
 
 class ErrorClassifier:
     """Классификатор ошибок HTTP"""
@@ -36,17 +108,32 @@ class ErrorClassifier:
             503: (ServerError, True),           # Повторяем
             504: (NetworkError, True),          # Повторяем
         }
+        self.retry_statuses = frozenset(
+            status for status, (_, should_retry) in self.error_mappings.items() if should_retry
+        )
+        
+        # Классификация всех статусов 0..599 вычисляется один раз
+        self._table = [self._classify(status_code) for status_code in range(600)]
     
     def classify_http_error(self, status_code: int, message: str) -> Dict[str, Any]:
         """Классификация HTTP ошибки"""
         
+        if 0 <= status_code < 600:
+            entry = self._table[status_code]
+        else:
+            entry = self._classify(status_code)
+        
+        return {**entry, "message": message}
+    
+    def _classify(self, status_code: int) -> Dict[str, Any]:
+        """Классификация статуса без сообщения"""
+        
         exception_type, should_retry = self.error_mappings.get(status_code, (None, False))
         
         return {
             "status_code": status_code,
             "exception_type": exception_type,
             "should_retry": should_retry,
-            "message": message,
             "category": self._get_error_category(status_code)
         }
     
@@ -63,6 +150,10 @@ class ErrorClassifier:
             return "unknown"
 
 
+# ErrorClassifier не хранит состояния, поэтому обработчики используют общий экземпляр
+_DEFAULT_CLASSIFIER = ErrorClassifier()
+
+
 class CircuitBreaker:
     """Circuit Breaker для защиты от каскадных сбоев"""
     
@@ -81,46 +172,66 @@ class CircuitBreaker:
         self.state = CircuitBreakerState.CLOSED
         self.failure_count = 0
         self.success_count = 0
-        self.last_failure_time: Optional[datetime] = None
+        # time.monotonic() последней ошибки: не зависит от перевода системных часов
+        self.last_failure_time: Optional[float] = None
         self.half_open_calls = 0
+        # Доля пропускаемых вызовов в HALF_OPEN: растет с каждой успешной пробой
+        self.current_capacity = 1.0
+        self._capacity_step = 1.0 / max(success_threshold, 1)
+        # Увеличивается при каждой смене состояния
+        self._generation = 0
     
     async def call(self, func: Callable, *args, **kwargs) -> Any:
-        """Выполнение функции через circuit breaker"""
+        """Выполнение функции через circuit breaker
+        
+        Проверка состояния и резервирование half-open слота выполняются без
+        await, поэтому атомарны в рамках event loop и не требуют asyncio.Lock.
+        Результат вызова учитывается только если состояние не сменилось,
+        пока он выполнялся: запоздавшие ответы, допущенные в CLOSED, не
+        засчитываются как half-open пробы и не переоткрывают breaker.
+        """
         
         if self.state == CircuitBreakerState.OPEN:
             if self._should_attempt_reset():
                 self._move_to_half_open()
             else:
-                raise Exception("Circuit breaker is OPEN")
+                raise CircuitBreakerOpen() from None
         
         if self.state == CircuitBreakerState.HALF_OPEN:
             if self.half_open_calls >= self.half_open_max_calls:
-                raise Exception("Circuit breaker HALF_OPEN max calls exceeded")
+                raise CircuitBreakerHalfOpenLimit() from None
+            # Первая проба пропускается всегда, остальные - с вероятностью current_capacity
+            if self.half_open_calls and _unit_random() >= self.current_capacity:
+                raise CircuitBreakerHalfOpenLimit("Circuit breaker HALF_OPEN recovery capacity exceeded") from None
             self.half_open_calls += 1
         
+        generation = self._generation
         try:
             result = await func(*args, **kwargs)
-            self._on_success()
-            return result
-            
-        except Exception as e:
-            self._on_failure()
+        except Exception:
+            if generation == self._generation:
+                self._on_failure()
             raise
+        
+        if generation == self._generation:
+            self._on_success()
+        return result
     
     def _should_attempt_reset(self) -> bool:
         """Проверка возможности сброса circuit breaker"""
         
-        if not self.last_failure_time:
+        if self.last_failure_time is None:
             return True
         
-        time_since_failure = datetime.now() - self.last_failure_time
-        return time_since_failure.total_seconds() >= self.recovery_timeout
+        return time.monotonic() - self.last_failure_time >= self.recovery_timeout
     
     def _move_to_half_open(self) -> None:
         """Переход в состояние HALF_OPEN"""
         
         self.state = CircuitBreakerState.HALF_OPEN
         self.half_open_calls = 0
+        self.current_capacity = 0.0
+        self._generation += 1
         logger.info("Circuit breaker moved to HALF_OPEN")
     
     def _on_success(self) -> None:
@@ -128,6 +239,7 @@ class CircuitBreaker:
         
         if self.state == CircuitBreakerState.HALF_OPEN:
             self.success_count += 1
+            self.current_capacity = min(1.0, self.current_capacity + self._capacity_step)
             if self.success_count >= self.success_threshold:
                 self._move_to_closed()
         else:
@@ -137,7 +249,7 @@ class CircuitBreaker:
         """Обработка неудачного вызова"""
         
         self.failure_count += 1
-        self.last_failure_time = datetime.now()
+        self.last_failure_time = time.monotonic()
         
         if self.state == CircuitBreakerState.HALF_OPEN:
             self._move_to_open()
@@ -150,6 +262,8 @@ class CircuitBreaker:
         self.state = CircuitBreakerState.CLOSED
         self.failure_count = 0
         self.success_count = 0
+        self.current_capacity = 1.0
+        self._generation += 1
         logger.info("Circuit breaker moved to CLOSED")
     
     def _move_to_open(self) -> None:
@@ -157,36 +271,176 @@ class CircuitBreaker:
         
         self.state = CircuitBreakerState.OPEN
         self.success_count = 0
+        self.current_capacity = 0.0
+        self._generation += 1
         logger.warning("Circuit breaker moved to OPEN")
 
 
-class ExponentialBackoffRetry:
-    """Retry с экспоненциальным backoff"""
+class RetryScheduler:
+    """Планировщик ожиданий перед повтором
+    
+    Сроки пробуждения округляются вверх до интервала resolution, и все
+    повторы с одним интервалом ждут общий future с одним таймером в event
+    loop. При шторме 429 это заменяет N таймеров на число интервалов.
+    Цена - до одного resolution дополнительной задержки; раньше запрошенного
+    срока повтор не выполняется.
+    """
+    
+    def __init__(self, resolution: float = 0.1):
+        self.resolution = resolution
+        self._buckets: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
     
-    def __init__(self, policy: RetryPolicy):
+    async def sleep(self, delay: float) -> None:
+        """Ожидание не меньше delay секунд"""
+        
+        if delay <= 0:
+            await asyncio.sleep(0)
+            return
+        
+        loop = asyncio.get_running_loop()
+        buckets = self._buckets.get(loop)
+        if buckets is None:
+            buckets = self._buckets[loop] = {}
+        
+        bucket = math.ceil((loop.time() + delay) / self.resolution)
+        waiter = buckets.get(bucket)
+        if waiter is None:
+            waiter = buckets[bucket] = loop.create_future()
+            loop.call_at(bucket * self.resolution, self._wake, buckets, bucket)
+        
+        # shield: отмена одного повтора не должна будить остальных
+        await asyncio.shield(waiter)
+    
+    @staticmethod
+    def _wake(buckets: Dict[int, asyncio.Future], bucket: int) -> None:
+        """Пробуждение всех повторов интервала"""
+        waiter = buckets.pop(bucket, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+_RETRY_SCHEDULER = RetryScheduler()
+
+
+def exponential_delay(
+    policy: RetryPolicy,
+    attempt: int,
+    prev_delay: float,
+    exception: Exception
+) -> float:
+    """Экспоненциальная задержка перед повтором
+    
+    Jitter выбирается по policy.jitter_mode (по умолчанию full jitter:
+    равномерно в [0, cap]), чтобы повторы клиентов не шли синхронными волнами.
+    prev_delay используется только decorrelated режимом.
+    """
+    
+    # Проверяем Retry-After для rate limit ошибок
+    if isinstance(exception, RateLimitExceeded) and exception.retry_after:
+        return min(exception.retry_after, policy.max_delay)
+    
+    # Экспоненциальный backoff из предвычисленной таблицы политики;
+    # за ее пределами (attempt вне 1..max_retries+1) считаем по формуле
+    delays = policy.exponential_delays
+    if 0 < attempt <= len(delays):
+        cap: float = delays[attempt - 1]
+    else:
+        try:
+            cap = min(policy.base_delay * policy.backoff_multiplier ** max(attempt - 1, 0), policy.max_delay)
+        except OverflowError:
+            cap = policy.max_delay
+    
+    mode: JitterMode = policy.jitter_mode if policy.jitter else JitterMode.NONE
+    if mode == JitterMode.FULL:
+        return cap * _unit_random()
+    if mode == JitterMode.EQUAL:
+        half = cap / 2
+        return half + half * _unit_random()
+    if mode == JitterMode.DECORRELATED:
+        base_delay = policy.base_delay
+        upper = max(prev_delay, base_delay) * 3
+        return min(policy.max_delay, base_delay + (upper - base_delay) * _unit_random())
+    
+    return cap
+
+
+def linear_delay(
+    policy: RetryPolicy,
+    attempt: int,
+    prev_delay: float,
+    exception: Exception
+) -> float:
+    """Линейная задержка перед повтором с jitter до 10%"""
+    
+    delays = policy.linear_delays
+    if 0 < attempt <= len(delays):
+        delay: float = delays[attempt - 1]
+    else:
+        delay = min(policy.base_delay * max(attempt, 1), policy.max_delay)
+    
+    if policy.jitter:
+        delay += delay * 0.1 * _unit_random()
+    
+    return delay
+
+
+# Функция задержки: (policy, номер попытки, предыдущая задержка, исключение) -> секунды
+DelayFunction = Callable[[RetryPolicy, int, float, Exception], float]
+
+
+class Retry:
+    """Retry с подключаемой функцией задержки
+    
+    При retry_all_errors=True повторяется любое исключение, без классификации
+    по типу и HTTP статусу (поведение линейного backoff).
+    """
+    
+    def __init__(
+        self,
+        policy: RetryPolicy,
+        delay_fn: DelayFunction = exponential_delay,
+        retry_all_errors: bool = False
+    ):
         self.policy = policy
-        self.error_classifier = ErrorClassifier()
+        self.error_classifier = _DEFAULT_CLASSIFIER
+        self._delay_fn = delay_fn
+        self.retry_all_errors = retry_all_errors
     
-    async def execute_with_retry(self, func: Callable) -> RetryResult:
-        """Выполнение функции с повторами"""
+    async def execute_with_retry(
+        self,
+        func: Callable,
+        args: tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None
+    ) -> RetryResult:
+        """Выполнение функции с повторами
+        
+        Аргументы передаются в func напрямую, без промежуточного замыкания.
+        """
         
-        attempts = 0
-        start_time = time.time()
-        retry_reasons = []
-        last_exception = None
+        if kwargs is None:
+            kwargs = {}
+        
+        attempts: int = 0
+        loop = asyncio.get_running_loop()
+        start_time: float = loop.time()
+        retry_reasons: List[RetryReason] = []
+        last_exception: Optional[Exception] = None
+        delay: float = 0.0
         
         while attempts <= self.policy.max_retries:
             attempts += 1
             
             try:
-                result = await func()
+                result = await func(*args, **kwargs)
                 
                 # Успешное выполнение
                 return RetryResult(
                     success=True,
                     attempts_made=attempts,
                     final_response=result,
-                    total_duration=time.time() - start_time,
+                    total_duration=loop.time() - start_time,
                     retry_reasons=retry_reasons
                 )
                 
@@ -194,26 +448,26 @@ class ExponentialBackoffRetry:
                 last_exception = e
                 
                 # Проверяем нужно ли повторять
-                should_retry = self._should_retry(e, attempts)
+                should_retry: bool = self._should_retry(e, attempts)
                 
                 if not should_retry or attempts > self.policy.max_retries:
                     break
                 
                 # Вычисляем задержку
-                delay = self._calculate_delay(attempts, e)
-                retry_reasons.append(f"Attempt {attempts}: {type(e).__name__} - retry in {delay:.1f}s")
+                delay = self._calculate_delay(attempts, e, delay)
+                retry_reasons.append(RetryReason(attempts, type(e).__name__, delay))
                 
-                logger.info(f"Retry attempt {attempts} after {delay:.1f}s due to: {e}")
+                logger.info("Retry attempt %d after %.1fs due to: %s", attempts, delay, e)
                 
                 # Ждем перед повтором
-                await asyncio.sleep(delay)
+                await _RETRY_SCHEDULER.sleep(delay)
         
         # Все попытки исчерпаны
         return RetryResult(
             success=False,
             attempts_made=attempts,
             final_error=last_exception,
-            total_duration=time.time() - start_time,
+            total_duration=loop.time() - start_time,
             retry_reasons=retry_reasons
         )
     
@@ -223,95 +477,40 @@ class ExponentialBackoffRetry:
         if attempt > self.policy.max_retries:
             return False
         
-        # Проверяем тип исключения
-        if isinstance(exception, RateLimitExceeded):
-            return True
-        elif isinstance(exception, (ServerError, NetworkError)):
+        if self.retry_all_errors:
             return True
-        elif isinstance(exception, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+        
+        # Проверяем тип исключения
+        decision: Optional[bool] = _lookup_by_type(_RETRY_DECISIONS, exception)
+        if decision is None:
             return self.policy.retry_on_timeout
-        elif isinstance(exception, AuthenticationError):
-            return False  # Не повторяем ошибки аутентификации
+        if decision is not _MISSING:
+            return decision
         
         # Проверяем HTTP статус коды если это ClientResponseError
-        if hasattr(exception, 'status'):
-            return exception.status in self.policy.retry_on_codes
+        status: Optional[int] = getattr(exception, 'status', None)
+        if status is not None:
+            return status in self.policy.retry_codes_set
         
         return False
     
-    def _calculate_delay(self, attempt: int, exception: Exception) -> float:
+    def _calculate_delay(self, attempt: int, exception: Exception, prev_delay: float = 0.0) -> float:
         """Вычисление задержки перед повтором"""
-        
-        # Проверяем Retry-After для rate limit ошибок
-        if isinstance(exception, RateLimitExceeded) and exception.retry_after:
-            return min(exception.retry_after, self.policy.max_delay)
-        
-        # Экспоненциальный backoff
-        delay = self.policy.base_delay * (self.policy.backoff_multiplier ** (attempt - 1))
-        delay = min(delay, self.policy.max_delay)
-        
-        # Добавляем jitter если включен
-        if self.policy.jitter:
-            jitter = delay * 0.1 * random.random()  # ±10% jitter
-            delay += jitter
-        
-        return delay
+        return self._delay_fn(self.policy, attempt, prev_delay, exception)
 
 
-class LinearBackoffRetry:
-    """Retry с линейным backoff"""
+class ExponentialBackoffRetry(Retry):
+    """Retry с экспоненциальным backoff"""
     
     def __init__(self, policy: RetryPolicy):
-        self.policy = policy
-        self.error_classifier = ErrorClassifier()
+        super().__init__(policy, exponential_delay)
+
+
+class LinearBackoffRetry(Retry):
+    """Retry с линейным backoff"""
     
-    async def execute_with_retry(self, func: Callable) -> RetryResult:
-        """Выполнение функции с линейными повторами"""
-        
-        attempts = 0
-        start_time = time.time()
-        retry_reasons = []
-        last_exception = None
-        
-        while attempts <= self.policy.max_retries:
-            attempts += 1
-            
-            try:
-                result = await func()
-                
-                return RetryResult(
-                    success=True,
-                    attempts_made=attempts,
-                    final_response=result,
-                    total_duration=time.time() - start_time,
-                    retry_reasons=retry_reasons
-                )
-                
-            except Exception as e:
-                last_exception = e
-                
-                if attempts > self.policy.max_retries:
-                    break
-                
-                # Линейное увеличение задержки
-                delay = self.policy.base_delay * attempts
-                delay = min(delay, self.policy.max_delay)
-                
-                if self.policy.jitter:
-                    jitter = delay * 0.1 * random.random()
-                    delay += jitter
-                
-                retry_reasons.append(f"Attempt {attempts}: {type(e).__name__}")
-                
-                await asyncio.sleep(delay)
-        
-        return RetryResult(
-            success=False,
-            attempts_made=attempts,
-            final_error=last_exception,
-            total_duration=time.time() - start_time,
-            retry_reasons=retry_reasons
-        )
+    def __init__(self, policy: RetryPolicy):
+        super().__init__(policy, linear_delay, retry_all_errors=True)
 
 
 class ErrorHandler:
@@ -325,64 +524,61 @@ class ErrorHandler:
         self.circuit_breaker = circuit_breaker
         self.collect_stats = collect_stats
         
-        self.error_classifier = ErrorClassifier()
-        self.stats = ErrorStats(
-            total_requests=0,
-            successful_requests=0,
-            rate_limit_errors=0,
-            server_errors=0,
-            network_errors=0,
-            timeout_errors=0,
-            other_errors=0
-        )
+        self.error_classifier = _DEFAULT_CLASSIFIER
+        # Счетчики по ErrorBucket; ErrorStats собирается по запросу
+        self._counts = array('Q', [0]) * len(ErrorBucket)
+        
+        # Отключенные возможности подменяются заглушками один раз при создании,
+        # чтобы на каждом вызове не проверять флаги
+        if circuit_breaker is None:
+            self.execute_with_circuit_breaker = _passthrough
+        if not collect_stats:
+            self.record_response = _noop
+            self.record_exception = _noop
     
-    async def execute_with_circuit_breaker(self, func: Callable) -> Any:
+    async def execute_with_circuit_breaker(self, func: Callable, *args, **kwargs) -> Any:
         """Выполнение функции через circuit breaker"""
-        
-        if not self.circuit_breaker:
-            return await func()
-        
-        return await self.circuit_breaker.call(func)
+        return await self.circuit_breaker.call(func, *args, **kwargs)
     
     def record_response(self, status_code: int, headers: Dict[str, str]) -> None:
         """Запись ответа для статистики"""
         
-        if not self.collect_stats:
-            return
-        
-        self.stats.total_requests += 1
+        counts = self._counts
+        counts[ErrorBucket.TOTAL] += 1
         
         if 200 <= status_code < 300:
-            self.stats.successful_requests += 1
+            counts[ErrorBucket.SUCCESS] += 1
         elif status_code == 429:
-            self.stats.rate_limit_errors += 1
+            counts[ErrorBucket.RATE_LIMIT] += 1
         elif 500 <= status_code < 600:
-            self.stats.server_errors += 1
+            counts[ErrorBucket.SERVER] += 1
         else:
-            self.stats.other_errors += 1
+            counts[ErrorBucket.OTHER] += 1
     
     def record_exception(self, exception: Exception) -> None:
         """Запись исключения для статистики"""
         
-        if not self.collect_stats:
-            return
-        
-        self.stats.total_requests += 1
-        
-        if isinstance(exception, RateLimitExceeded):
-            self.stats.rate_limit_errors += 1
-        elif isinstance(exception, ServerError):
-            self.stats.server_errors += 1
-        elif isinstance(exception, NetworkError):
-            self.stats.network_errors += 1
-        elif isinstance(exception, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
-            self.stats.timeout_errors += 1
-        else:
-            self.stats.other_errors += 1
+        counts = self._counts
+        counts[ErrorBucket.TOTAL] += 1
+        counts[_lookup_by_type(_EXC_BUCKET, exception, ErrorBucket.OTHER)] += 1
     
     def get_error_stats(self) -> ErrorStats:
         """Получение статистики ошибок"""
-        return self.stats
+        counts = self._counts
+        return ErrorStats(
+            total_requests=counts[ErrorBucket.TOTAL],
+            successful_requests=counts[ErrorBucket.SUCCESS],
+            rate_limit_errors=counts[ErrorBucket.RATE_LIMIT],
+            server_errors=counts[ErrorBucket.SERVER],
+            network_errors=counts[ErrorBucket.NETWORK],
+            timeout_errors=counts[ErrorBucket.TIMEOUT],
+            other_errors=counts[ErrorBucket.OTHER]
+        )
+    
+    @property
+    def stats(self) -> ErrorStats:
+        """Снимок статистики ошибок (совместимость с прежним атрибутом)"""
+        return self.get_error_stats()
     
     async def handle_custom_error(self, error: Exception) -> bool:
         """Обработка кастомных ошибок (переопределяется в наследниках)"""
@@ -419,37 +615,35 @@ class RetryManager:
     """Менеджер retry стратегий"""
     
     def __init__(self):
-        self.strategies = {
-            "exponential": ExponentialBackoffRetry,
-            "linear": LinearBackoffRetry
+        self.strategies: Dict[str, DelayFunction] = {
+            "exponential": exponential_delay,
+            "linear": linear_delay
         }
     
-    def get_retry_handler(self, strategy: str, policy: RetryPolicy):
+    def get_retry_handler(self, strategy: str, policy: RetryPolicy) -> Retry:
         """Получение обработчика retry"""
         
         if strategy not in self.strategies:
             raise ValueError(f"Неизвестная retry стратегия: {strategy}")
         
-        return self.strategies[strategy](policy)
+        delay_fn = self.strategies[strategy]
+        return Retry(policy, delay_fn, retry_all_errors=delay_fn is linear_delay)
     
-    def register_strategy(self, name: str, strategy_class: Type):
-        """Регистрация новой retry стратегии"""
-        self.strategies[name] = strategy_class
+    def register_strategy(self, name: str, delay_fn: DelayFunction):
+        """Регистрация новой retry стратегии по функции задержки"""
+        self.strategies[name] = delay_fn
 
 
 # Декораторы для упрощения использования
 def with_retry(policy: RetryPolicy, strategy: str = "exponential"):
     """Декоратор для добавления retry к функции"""
     
+    # Обработчик не хранит состояния между вызовами, поэтому создается один раз
+    retry_handler = RetryManager().get_retry_handler(strategy, policy)
+    
     def decorator(func):
         async def wrapper(*args, **kwargs):
-            retry_manager = RetryManager()
-            retry_handler = retry_manager.get_retry_handler(strategy, policy)
-            
-            async def execute():
-                return await func(*args, **kwargs)
-            
-            result = await retry_handler.execute_with_retry(execute)
+            result = await retry_handler.execute_with_retry(func, args, kwargs)
             
             if result.success:
                 return result.final_response
@@ -493,7 +687,7 @@ async def safe_execute(
         return await func()
     except Exception as e:
         if log_errors:
-            logger.error(f"Ошибка выполнения функции {func.__name__}: {e}")
+            logger.error("Ошибка выполнения функции %s: %s", func.__name__, e)
         
         if error_handler:
             error_handler.record_exception(e)
@@ -49,3 +49,17 @@ class AIServiceError(RateLimitOptimizerError):
 class StorageError(RateLimitOptimizerError):
     """Ошибка хранения данных"""
     pass
+
+
+class CircuitBreakerOpen(RateLimitOptimizerError):
+    """Circuit breaker открыт, вызов отклонен"""
+    
+    def __init__(self, message: str = "Circuit breaker is OPEN"):
+        super().__init__(message)
+
+
+class CircuitBreakerHalfOpenLimit(RateLimitOptimizerError):
+    """Circuit breaker в HALF_OPEN не пропускает больше проб"""
+    
+    def __init__(self, message: str = "Circuit breaker HALF_OPEN max calls exceeded"):
+        super().__init__(message)
@@ -2,19 +2,22 @@
 Основной модуль Rate Limit Optimizer
 """
 import asyncio
+import base64
+import hashlib
 import logging
+import os
 import sys
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from urllib.parse import urlsplit
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 
+import orjson
+from cachetools import TTLCache
+
 from .config import ConfigManager
 from .detection import MultiTierDetector
-from .ai import AIRecommender
-from .rotation import EndpointRotator
-from .storage import JSONResultsStorage
-from .performance import PerformanceMonitor, ResourceMonitor
-from .error_handling import ErrorHandler, CircuitBreaker
 from .models import (
     DetectionResult, MultiTierResult, APIContext, 
     TargetSite, DetectionSettings, StorageConfig
@@ -24,8 +27,41 @@ from .exceptions import (
     AIServiceError, StorageError
 )
 
+if TYPE_CHECKING:
+    from .ai import AIRecommender
+    from .storage import JSONResultsStorage
+    from .performance import PerformanceMonitor, ResourceMonitor
+    from .error_handling import ErrorHandler
+
+# AI клиент, хранилище (pandas, cryptography; при results_storage.save_results),
+# мониторинг (psutil) и обработка ошибок импортируются в initialize() только
+# если соответствующая часть включена
+
 logger = logging.getLogger(__name__)
 
+# Переиспользуемый пустой контекст (поддерживает и with, и async with)
+_NULL_CONTEXT = nullcontext()
+
+# Подписи и поля лимитов для вывода результатов
+_LIMIT_FIELDS = (
+    ("10 секунд", "ten_second_limit"),
+    ("Минута", "minute_limit"),
+    ("15 минут", "fifteen_minute_limit"),
+    ("Час", "hour_limit"),
+    ("День", "day_limit"),
+)
+
+
+def _write_lines(lines: List[str]) -> None:
+    """Вывод строк в stdout одной записью"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def _null_scope(*args, **kwargs) -> nullcontext:
+    """Замена контекстов мониторинга, когда мониторинг отключен"""
+    return _NULL_CONTEXT
+
 
 class RateLimitOptimizer:
     """Основной класс Rate Limit Optimizer"""
@@ -35,7 +71,8 @@ class RateLimitOptimizer:
         config_path: Optional[Path] = None,
         enable_ai: bool = True,
         enable_performance_monitoring: bool = True,
-        enable_error_handling: bool = True
+        enable_error_handling: bool = True,
+        detection_cache_ttl: float = 0.0
     ):
         self.config_path = config_path
         self.enable_ai = enable_ai
@@ -45,14 +82,41 @@ class RateLimitOptimizer:
         # Компоненты
         self.config_manager: Optional[ConfigManager] = None
         self.detector: Optional[MultiTierDetector] = None
-        self.ai_recommender: Optional[AIRecommender] = None
-        self.storage: Optional[JSONResultsStorage] = None
-        self.performance_monitor: Optional[PerformanceMonitor] = None
-        self.resource_monitor: Optional[ResourceMonitor] = None
-        self.error_handler: Optional[ErrorHandler] = None
+        self.ai_recommender: Optional["AIRecommender"] = None
+        self.storage: Optional["JSONResultsStorage"] = None
+        self.performance_monitor: Optional["PerformanceMonitor"] = None
+        self.resource_monitor: Optional["ResourceMonitor"] = None
+        self.error_handler: Optional["ErrorHandler"] = None
+        
+        # Контексты мониторинга выбираются один раз в initialize()
+        self._measure = _null_scope
+        self._resource_scope = _null_scope
         
         # Состояние
         self._initialized = False
+        
+        # Разрешенные конфигурации сайтов; сбрасываются при смене объекта Config
+        # или изменении набора сайтов через ConfigManager (sites_version)
+        self._site_config_cache: Dict[str, TargetSite] = {}
+        self._site_config_source: Optional[Tuple[Any, int]] = None
+        # Заголовки аутентификации сайтов (env и base64 читаются один раз)
+        self._auth_headers_cache: Dict[str, Dict[str, str]] = {}
+        
+        # Контекст API для AI строится один раз на (base_url, тип аутентификации)
+        self._api_context_cache: Dict[Tuple[str, str], APIContext] = {}
+        
+        # Недавние результаты определения в памяти процесса (между запусками CLI
+        # не сохраняются). Кэш включается явно: detection_cache_ttl > 0 секунд
+        self.detection_cache_ttl = detection_cache_ttl
+        self._detection_cache: Optional[TTLCache] = None
+        if detection_cache_ttl > 0:
+            self._detection_cache = TTLCache(
+                maxsize=int(os.getenv('RLO_DETECTION_CACHE_MAX', 256)),
+                ttl=detection_cache_ttl
+            )
+        # Хэши конфигураций сайтов и настроек определения; сбрасываются вместе
+        # с кэшем конфигураций
+        self._site_config_hash: Dict[str, str] = {}
     
     async def initialize(self) -> None:
         """Инициализация компонентов"""
@@ -62,6 +126,11 @@ class RateLimitOptimizer:
         
         logger.info("Инициализация Rate Limit Optimizer...")
         
+        self._site_config_cache.clear()
+        self._auth_headers_cache.clear()
+        self._site_config_hash.clear()
+        self._site_config_source = None
+        
         try:
             # Загружаем конфигурацию
             self.config_manager = ConfigManager(self.config_path)
@@ -75,35 +144,43 @@ class RateLimitOptimizer:
             self._setup_logging(config.logging)
             
             # Инициализируем детектор
-            self.detector = MultiTierDetector()
+            self.detector = MultiTierDetector(keep_session=True)
             
             # Инициализируем AI рекомендации если включены
             if self.enable_ai and config.ai_recommendations.enabled:
                 try:
+                    from .ai import AIRecommender
                     self.ai_recommender = AIRecommender.from_environment()
                     logger.info("AI рекомендации включены")
                 except Exception as e:
-                    logger.warning(f"Не удалось инициализировать AI: {e}")
+                    logger.warning("Не удалось инициализировать AI: %s", e)
                     self.ai_recommender = None
             
-            # Инициализируем хранилище
-            storage_config = StorageConfig(
-                save_results=config.results_storage.save_results,
-                output_format=config.results_storage.output_format,
-                output_file=config.results_storage.output_file
-            )
-            
-            storage_dir = Path("results")
-            self.storage = JSONResultsStorage(storage_dir, storage_config)
+            # Инициализируем хранилище, если сохранение результатов включено
+            # (поля уже провалидированы в ResultsStorage)
+            if config.results_storage.save_results:
+                storage_config = StorageConfig.model_construct(
+                    save_results=config.results_storage.save_results,
+                    output_format=config.results_storage.output_format,
+                    output_file=config.results_storage.output_file
+                )
+                
+                from .storage import JSONResultsStorage
+                storage_dir = Path("results")
+                self.storage = JSONResultsStorage(storage_dir, storage_config)
             
             # Инициализируем мониторинг производительности
             if self.enable_performance_monitoring:
+                from .performance import PerformanceMonitor, ResourceMonitor
                 self.performance_monitor = PerformanceMonitor()
                 self.resource_monitor = ResourceMonitor()
+                self._measure = self.performance_monitor.measure_operation
+                self._resource_scope = self._monitor_resources
                 logger.info("Мониторинг производительности включен")
             
             # Инициализируем обработку ошибок
             if self.enable_error_handling:
+                from .error_handling import ErrorHandler, CircuitBreaker
                 circuit_breaker = CircuitBreaker(
                     failure_threshold=5,
                     recovery_timeout=60.0
@@ -115,7 +192,7 @@ class RateLimitOptimizer:
             logger.info("Rate Limit Optimizer успешно инициализирован")
             
         except Exception as e:
-            logger.error(f"Ошибка инициализации: {e}")
+            logger.error("Ошибка инициализации: %s", e)
             raise ConfigurationError(f"Не удалось инициализировать Rate Limit Optimizer: {e}")
     
     async def detect_rate_limits(
@@ -125,34 +202,60 @@ class RateLimitOptimizer:
         validate_consistency: bool = True,
         generate_ai_recommendations: bool = True
     ) -> DetectionResult:
-        """Определение rate limits для сайта"""
+        """Определение rate limits для сайта
+        
+        При detection_cache_ttl > 0 свежий результат с теми же аргументами и
+        конфигурацией возвращается из кэша в памяти процесса без новых запросов.
+        """
         
         if not self._initialized:
             await self.initialize()
         
-        logger.info(f"Начинаем определение rate limits для {site_name}")
-        
-        # Получаем конфигурацию сайта
-        config = self.config_manager.get_config()
-        if not config:
-            raise ConfigurationError("Конфигурация не загружена")
-        
-        site_config = config.target_sites.get(site_name)
-        if not site_config:
-            raise ConfigurationError(f"Конфигурация для сайта {site_name} не найдена")
+        return await self._detect_site(
+            site_name, strategy, validate_consistency, generate_ai_recommendations
+        )
+    
+    async def _detect_site(
+        self,
+        site_name: str,
+        strategy: str,
+        validate_consistency: bool,
+        generate_ai_recommendations: bool,
+        probes_done: Optional[asyncio.Event] = None
+    ) -> DetectionResult:
+        """Определение лимитов сайта; probes_done выставляется сразу после
+        запросов к сайту, до AI рекомендаций и сохранения"""
         
-        # Запускаем мониторинг ресурсов
-        if self.resource_monitor:
-            self.resource_monitor.start_monitoring()
+        logger.info("Начинаем определение rate limits для %s", site_name)
         
-        try:
+        # Получаем конфигурацию сайта
+        site_config, detection_settings = self._resolve_site(site_name)
+        
+        # Сайт с той же конфигурацией недавно уже измерялся
+        cache_key = None
+        if self._detection_cache is not None:
+            cache_key = self._detection_cache_key(
+                site_name, site_config, detection_settings,
+                strategy, validate_consistency, generate_ai_recommendations
+            )
+            cached = self._detection_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Используем кэшированные rate limits для %s", site_name)
+                # Каждый вызывающий получает свою копию результата
+                return cached.model_copy(deep=True)
+        
+        # Мониторинг ресурсов на время определения
+        with self._resource_scope():
             # Определяем лимиты
             detection_result = await self._detect_limits_impl(
+                site_name,
                 site_config, 
-                config.detection_settings,
+                detection_settings,
                 strategy,
                 validate_consistency
             )
+            if probes_done is not None:
+                probes_done.set()
             
             # Генерируем AI рекомендации
             ai_recommendations = None
@@ -174,20 +277,115 @@ class RateLimitOptimizer:
                 detection_methods=["headers", "testing"]
             )
             
+            if cache_key is not None:
+                self._detection_cache[cache_key] = result.model_copy(deep=True)
+            
             # Сохраняем результаты
             if self.storage:
                 await self._save_results(result)
             
-            logger.info(f"Определение rate limits для {site_name} завершено")
+            logger.info("Определение rate limits для %s завершено", site_name)
             return result
-            
+    
+    @contextmanager
+    def _monitor_resources(self):
+        """Запуск и остановка мониторинга ресурсов"""
+        
+        self.resource_monitor.start_monitoring()
+        try:
+            yield
         finally:
-            # Останавливаем мониторинг ресурсов
-            if self.resource_monitor:
-                self.resource_monitor.stop_monitoring()
+            self.resource_monitor.stop_monitoring()
+    
+    def _resolve_site(self, site_name: str) -> Tuple[TargetSite, DetectionSettings]:
+        """Конфигурация сайта и настройки определения с кэшированием по объекту Config"""
+        
+        config = self.config_manager.get_config()
+        if not config:
+            raise ConfigurationError("Конфигурация не загружена")
+        
+        source = self._site_config_source
+        version = self.config_manager.sites_version
+        if source is None or source[0] is not config or source[1] != version:
+            self._site_config_cache.clear()
+            self._auth_headers_cache.clear()
+            self._site_config_hash.clear()
+            self._site_config_source = (config, version)
+        
+        site_config = self._site_config_cache.get(site_name)
+        if site_config is None:
+            site_config = config.target_sites.get(site_name)
+            if not site_config:
+                raise ConfigurationError(f"Конфигурация для сайта {site_name} не найдена")
+            self._site_config_cache[site_name] = site_config
+        
+        return site_config, config.detection_settings
+    
+    def _config_hash(
+        self,
+        site_name: str,
+        site_config: TargetSite,
+        detection_settings: DetectionSettings
+    ) -> str:
+        """Хэш конфигурации сайта и настроек определения для ключа кэша результатов"""
+        
+        config_hash = self._site_config_hash.get(site_name)
+        if config_hash is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(site_config.model_dump_json().encode())
+            digest.update(detection_settings.model_dump_json().encode())
+            config_hash = self._site_config_hash[site_name] = digest.hexdigest()
+        return config_hash
+    
+    def _detection_cache_key(
+        self,
+        site_name: str,
+        site_config: TargetSite,
+        detection_settings: DetectionSettings,
+        strategy: str,
+        validate_consistency: bool,
+        generate_ai_recommendations: bool
+    ) -> Tuple[Any, ...]:
+        """Ключ кэша результатов: все, что влияет на результат определения"""
+        
+        return (
+            site_name,
+            self._config_hash(site_name, site_config, detection_settings),
+            strategy,
+            validate_consistency,
+            bool(generate_ai_recommendations and self.ai_recommender)
+        )
+    
+    def has_cache(
+        self,
+        site_name: str,
+        strategy: str = "multi_tier_ramp",
+        validate_consistency: bool = True,
+        generate_ai_recommendations: bool = True
+    ) -> bool:
+        """Есть ли в кэше процесса свежий результат detect_rate_limits с этими
+        аргументами для текущей конфигурации сайта
+        
+        Кэш хранится только в памяти и включается параметром detection_cache_ttl.
+        """
+        
+        if self._detection_cache is None or not self._initialized:
+            return False
+        
+        try:
+            site_config, detection_settings = self._resolve_site(site_name)
+        except ConfigurationError:
+            return False
+        
+        cache_key = self._detection_cache_key(
+            site_name, site_config, detection_settings,
+            strategy, validate_consistency, generate_ai_recommendations
+        )
+        return cache_key in self._detection_cache
     
     async def _detect_limits_impl(
         self,
+        site_name: str,
         site_config: TargetSite,
         detection_settings: DetectionSettings,
         strategy: str,
@@ -198,34 +396,28 @@ class RateLimitOptimizer:
         # Выбираем первый endpoint для тестирования
         primary_endpoint = site_config.endpoints[0] if site_config.endpoints else "/v1/test"
         
-        # Подготавливаем заголовки
-        headers = site_config.headers.copy()
+        # Подготавливаем заголовки с аутентификацией, вычисленной один раз на сайт
+        auth_headers = self._auth_headers_cache.get(site_name)
+        if auth_headers is None:
+            if site_config.auth.type.value != "none":
+                auth_headers = self._prepare_auth_headers(site_config.auth)
+            else:
+                auth_headers = {}
+            self._auth_headers_cache[site_name] = auth_headers
         
-        # Добавляем аутентификацию если нужно
-        if site_config.auth.type.value != "none":
-            auth_headers = self._prepare_auth_headers(site_config.auth)
-            headers.update(auth_headers)
+        headers = {**site_config.headers, **auth_headers}
         
         # Получаем tiers для тестирования
-        tiers_to_test = detection_settings.multi_tier_detection.tiers_to_test
+        multi_tier_detection = detection_settings.multi_tier_detection
         
-        # Используем мониторинг производительности если доступен
-        if self.performance_monitor:
-            async with self.performance_monitor.measure_operation("rate_limit_detection"):
-                return await self.detector.detect_all_rate_limits(
-                    base_url=site_config.base_url,
-                    endpoint=primary_endpoint,
-                    headers=headers,
-                    tiers_to_test=tiers_to_test,
-                    validate_consistency=validate_consistency
-                )
-        else:
+        async with self._measure("rate_limit_detection"):
             return await self.detector.detect_all_rate_limits(
                 base_url=site_config.base_url,
                 endpoint=primary_endpoint,
                 headers=headers,
-                tiers_to_test=tiers_to_test,
-                validate_consistency=validate_consistency
+                tiers_to_test=multi_tier_detection.tiers_to_test,
+                validate_consistency=validate_consistency,
+                force_test=multi_tier_detection.force_tier_testing
             )
     
     def _prepare_auth_headers(self, auth_config) -> Dict[str, str]:
@@ -234,20 +426,16 @@ class RateLimitOptimizer:
         headers = {}
         
         if auth_config.type.value == "api_key" and auth_config.key_env:
-            import os
             api_key = os.getenv(auth_config.key_env)
             if api_key:
                 headers["X-API-Key"] = api_key
         
         elif auth_config.type.value == "bearer_token" and auth_config.token_env:
-            import os
             token = os.getenv(auth_config.token_env)
             if token:
                 headers["Authorization"] = f"Bearer {token}"
         
         elif auth_config.type.value == "basic_auth":
-            import os
-            import base64
             username = os.getenv(auth_config.username_env) if auth_config.username_env else ""
             password = os.getenv(auth_config.password_env) if auth_config.password_env else ""
             
@@ -269,32 +457,30 @@ class RateLimitOptimizer:
         
         try:
             # Создаем контекст API
-            api_context = APIContext(
-                api_name=site_config.base_url,
-                base_url=site_config.base_url,
-                api_type="REST",
-                authentication_type=site_config.auth.type.value,
-                primary_use_case="rate_limit_testing",
-                business_criticality="medium",
-                expected_load="medium"
-            )
+            context_key = (site_config.base_url, site_config.auth.type.value)
+            api_context = self._api_context_cache.get(context_key)
+            if api_context is None:
+                api_context = APIContext(
+                    api_name=site_config.base_url,
+                    base_url=site_config.base_url,
+                    api_type="REST",
+                    authentication_type=site_config.auth.type.value,
+                    primary_use_case="rate_limit_testing",
+                    business_criticality="medium",
+                    expected_load="medium"
+                )
+                self._api_context_cache[context_key] = api_context
             
-            # Используем мониторинг если доступен
-            if self.performance_monitor:
-                async with self.performance_monitor.measure_operation("ai_recommendations"):
-                    return await self.ai_recommender.generate_recommendations(
-                        detection_result, api_context
-                    )
-            else:
+            async with self._measure("ai_recommendations"):
                 return await self.ai_recommender.generate_recommendations(
                     detection_result, api_context
                 )
                 
         except AIServiceError as e:
-            logger.warning(f"Не удалось сгенерировать AI рекомендации: {e}")
+            logger.warning("Не удалось сгенерировать AI рекомендации: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Ошибка генерации AI рекомендаций: {e}")
+            logger.error("Ошибка генерации AI рекомендаций: %s", e)
             return None
     
     async def _save_results(self, result: DetectionResult) -> None:
@@ -304,18 +490,16 @@ class RateLimitOptimizer:
             return
         
         try:
-            if self.performance_monitor:
-                async with self.performance_monitor.measure_operation("save_results"):
-                    self.storage.save_results(result)
-            else:
-                self.storage.save_results(result)
+            async with self._measure("save_results"):
+                # Сериализация и запись на диск не должны блокировать event loop
+                await asyncio.to_thread(self.storage.save_results, result)
                 
             logger.info("Результаты сохранены")
             
         except StorageError as e:
-            logger.error(f"Ошибка сохранения результатов: {e}")
+            logger.error("Ошибка сохранения результатов: %s", e)
         except Exception as e:
-            logger.error(f"Неожиданная ошибка сохранения: {e}")
+            logger.error("Неожиданная ошибка сохранения: %s", e)
     
     def _setup_logging(self, logging_config) -> None:
         """Настройка логирования"""
@@ -330,9 +514,10 @@ class RateLimitOptimizer:
         root_logger = logging.getLogger()
         root_logger.setLevel(level)
         
-        # Очищаем существующие обработчики
-        for handler in root_logger.handlers[:]:
-            root_logger.removeHandler(handler)
+        # Очищаем существующие обработчики; закрываем их, чтобы не оставлять открытые файлы
+        for handler in root_logger.handlers:
+            handler.close()
+        root_logger.handlers.clear()
         
         # Консольный вывод
         if logging_config.console_output:
@@ -358,28 +543,55 @@ class RateLimitOptimizer:
         if not site_names:
             return []
         
-        logger.info(f"Определение rate limits для {len(site_names)} сайтов")
+        logger.info("Определение rate limits для %d сайтов", len(site_names))
         
         if parallel:
-            # Параллельное выполнение
-            semaphore = asyncio.Semaphore(max_concurrent)
-            
-            async def detect_site(site_name: str) -> DetectionResult:
-                async with semaphore:
-                    return await self.detect_rate_limits(site_name, strategy)
-            
-            tasks = [detect_site(site_name) for site_name in site_names]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Фильтруем успешные результаты
-            valid_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, DetectionResult):
-                    valid_results.append(result)
-                else:
-                    logger.error(f"Ошибка определения лимитов для {site_names[i]}: {result}")
-            
-            return valid_results
+            if not self._initialized:
+                await self.initialize()
+            
+            # Сайты на одном хосте пробуются одним воркером по очереди, чтобы не
+            # нагружать хост параллельно и не искажать лимиты друг друга (лимиты
+            # часто общие на хост). Это мера вежливости к хосту, а не ускорение:
+            # число запросов то же, а сайты одного хоста завершаются позже, чем
+            # при полностью параллельном запуске
+            groups: Dict[str, List[Tuple[int, str]]] = {}
+            for index, site_name in enumerate(site_names):
+                groups.setdefault(self._site_group_key(site_name), []).append((index, site_name))
+            
+            # max_concurrent воркеров разбирают общий итератор групп,
+            # ошибки логируются сразу по завершении сайта
+            pending = iter(groups.values())
+            results: List[Optional[DetectionResult]] = [None] * len(site_names)
+            
+            async def worker() -> None:
+                for group in pending:
+                    # Следующий сайт группы начинает пробы, как только закончены
+                    # пробы предыдущего: AI рекомендации и сохранение предыдущего
+                    # идут параллельно, а нагрузка на хост остается поочередной
+                    tasks = []
+                    for index, site_name in group:
+                        probes_done = asyncio.Event()
+                        task = asyncio.create_task(
+                            self._detect_site(site_name, strategy, True, True, probes_done)
+                        )
+                        # Ошибка или кэшированный результат тоже освобождают хост
+                        task.add_done_callback(lambda _, event=probes_done: event.set())
+                        tasks.append((index, site_name, task))
+                        await probes_done.wait()
+                    
+                    for index, site_name, task in tasks:
+                        try:
+                            results[index] = await task
+                        except Exception as e:
+                            logger.error("Ошибка определения лимитов для %s: %s", site_name, e)
+            
+            # Воркеров не больше, чем групп: при достаточном max_concurrent
+            # каждая группа сразу получает свой воркер без ожидания
+            worker_count = max(1, min(max_concurrent, len(groups)))
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+            
+            # Порядок результатов совпадает с порядком site_names
+            return [result for result in results if result is not None]
         else:
             # Последовательное выполнение
             results = []
@@ -388,10 +600,21 @@ class RateLimitOptimizer:
                     result = await self.detect_rate_limits(site_name, strategy)
                     results.append(result)
                 except Exception as e:
-                    logger.error(f"Ошибка определения лимитов для {site_name}: {e}")
+                    logger.error("Ошибка определения лимитов для %s: %s", site_name, e)
             
             return results
     
+    def _site_group_key(self, site_name: str) -> str:
+        """Ключ группировки сайтов для параллельного определения (хост base_url)"""
+        
+        try:
+            site_config, _ = self._resolve_site(site_name)
+        except ConfigurationError:
+            # Ошибка конфигурации будет залогирована при определении лимитов
+            return site_name
+        
+        return urlsplit(site_config.base_url).hostname or site_config.base_url
+    
     def get_performance_metrics(self) -> Optional[Dict[str, Any]]:
         """Получение метрик производительности"""
         
@@ -424,10 +647,18 @@ class RateLimitOptimizer:
         # Останавливаем мониторинг
         if self.resource_monitor:
             self.resource_monitor.stop_monitoring()
+
+        # Закрываем общую HTTP сессию детектора
+        if self.detector:
+            await self.detector.aclose()
         
+        # Закрываем HTTP сессию AI клиента
+        if self.ai_recommender:
+            await self.ai_recommender.aclose()
+
         # Сохраняем батч результатов если есть
         if self.storage and hasattr(self.storage, 'flush_batch'):
-            self.storage.flush_batch()
+            await asyncio.to_thread(self.storage.flush_batch)
         
         logger.info("Очистка завершена")
 
@@ -483,78 +714,76 @@ class CLIRunner:
                 self._print_performance_metrics()
             
         except Exception as e:
-            logger.error(f"Ошибка выполнения: {e}")
+            logger.error("Ошибка выполнения: %s", e)
             raise
         finally:
             if self.optimizer:
                 await self.optimizer.cleanup()
     
     def _print_results(self, result: DetectionResult) -> None:
-        """Вывод результатов в консоль"""
+        """Вывод результатов в консоль одной записью в stdout"""
         
-        print("\n" + "="*60)
-        print(f"РЕЗУЛЬТАТЫ ОПРЕДЕЛЕНИЯ RATE LIMITS")
-        print("="*60)
+        lines: List[str] = []
+        lines.append("\n" + "="*60)
+        lines.append(f"РЕЗУЛЬТАТЫ ОПРЕДЕЛЕНИЯ RATE LIMITS")
+        lines.append("="*60)
         
-        print(f"Сайт: {result.site_name}")
-        print(f"Стратегия: {result.detection_strategy}")
-        print(f"Длительность тестирования: {result.total_test_duration_hours:.2f} часов")
-        print(f"Процент успешности: {result.success_rate:.1%}")
+        lines.append(f"Сайт: {result.site_name}")
+        lines.append(f"Стратегия: {result.detection_strategy}")
+        lines.append(f"Длительность тестирования: {result.total_test_duration_hours:.2f} часов")
+        lines.append(f"Процент успешности: {result.success_rate:.1%}")
         
         detection = result.detection_results
-        print(f"\nСамый строгий лимит: {detection.most_restrictive}")
-        print(f"Рекомендуемая частота: {detection.recommended_rate} запросов")
-        print(f"Найдено лимитов: {detection.limits_found}")
-        print(f"Уверенность: {detection.confidence_score:.1%}")
+        lines.append(f"\nСамый строгий лимит: {detection.most_restrictive}")
+        lines.append(f"Рекомендуемая частота: {detection.recommended_rate} запросов")
+        lines.append(f"Найдено лимитов: {detection.limits_found}")
+        lines.append(f"Уверенность: {detection.confidence_score:.1%}")
         
         # Детали лимитов
-        print("\nОБНАРУЖЕННЫЕ ЛИМИТЫ:")
-        print("-" * 40)
-        
-        limits = [
-            ("10 секунд", detection.ten_second_limit),
-            ("Минута", detection.minute_limit),
-            ("15 минут", detection.fifteen_minute_limit),
-            ("Час", detection.hour_limit),
-            ("День", detection.day_limit)
-        ]
-        
-        for name, limit in limits:
+        lines.append("\nОБНАРУЖЕННЫЕ ЛИМИТЫ:")
+        lines.append("-" * 40)
+        
+        for name, attr in _LIMIT_FIELDS:
+            limit = getattr(detection, attr)
             if limit:
-                print(f"{name}: {limit.limit} запросов (осталось: {limit.remaining})")
+                lines.append(f"{name}: {limit.limit} запросов (осталось: {limit.remaining})")
         
         # AI рекомендации
         if result.ai_recommendations:
             ai = result.ai_recommendations
-            print(f"\nAI РЕКОМЕНДАЦИИ:")
-            print("-" * 40)
-            print(f"Уверенность: {ai.confidence_score:.1%}")
-            print(f"Оценка рисков: {ai.risk_assessment}")
-            print(f"\nСтратегия использования:")
-            print(ai.analysis.optimal_usage_strategy)
+            lines.append(f"\nAI РЕКОМЕНДАЦИИ:")
+            lines.append("-" * 40)
+            lines.append(f"Уверенность: {ai.confidence_score:.1%}")
+            lines.append(f"Оценка рисков: {ai.risk_assessment}")
+            lines.append(f"\nСтратегия использования:")
+            lines.append(ai.analysis.optimal_usage_strategy)
             
             if ai.analysis.implementation_patterns:
-                print(f"\nПаттерны реализации:")
+                lines.append(f"\nПаттерны реализации:")
                 for pattern in ai.analysis.implementation_patterns:
-                    print(f"• {pattern}")
+                    lines.append(f"• {pattern}")
+        
+        lines.append("\n" + "="*60)
         
-        print("\n" + "="*60)
+        _write_lines(lines)
     
     def _save_to_file(self, result: DetectionResult, output_file: str) -> None:
         """Сохранение результатов в файл"""
         
-        import json
-        
         try:
-            data = result.model_dump(mode='json')
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, default=str, ensure_ascii=False, indent=2)
+            # JSON-режим pydantic приводит все значения (datetime, enum, вложенные
+            # модели) к JSON типам так же, как model_dump_json; orjson пишет
+            # UTF-8 без экранирования
+            data = orjson.dumps(
+                result.model_dump(mode="json"),
+                option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+            )
+            Path(output_file).write_bytes(data)
             
             print(f"\nРезультаты сохранены в {output_file}")
             
         except Exception as e:
-            logger.error(f"Ошибка сохранения в файл: {e}")
+            logger.error("Ошибка сохранения в файл: %s", e)
     
     def _print_performance_metrics(self) -> None:
         """Вывод метрик производительности"""
@@ -566,24 +795,27 @@ class CLIRunner:
         if not metrics:
             return
         
-        print(f"\nМЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ:")
-        print("-" * 40)
+        lines: List[str] = []
+        lines.append(f"\nМЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ:")
+        lines.append("-" * 40)
         
         # Метрики запросов
         if 'request_metrics' in metrics:
             for name, data in metrics['request_metrics'].items():
-                print(f"{name}:")
-                print(f"  Запросов: {data['total_requests']}")
-                print(f"  Успешность: {data['success_rate']:.1%}")
-                print(f"  Среднее время: {data['average_response_time']:.3f}s")
+                lines.append(f"{name}:")
+                lines.append(f"  Запросов: {data['total_requests']}")
+                lines.append(f"  Успешность: {data['success_rate']:.1%}")
+                lines.append(f"  Среднее время: {data['average_response_time']:.3f}s")
         
         # Использование ресурсов
         if 'resource_usage' in metrics:
             usage = metrics['resource_usage']
-            print(f"\nИспользование ресурсов:")
-            print(f"  Пиковая память: {usage['peak_memory_mb']:.1f} MB")
-            print(f"  Средняя память: {usage['average_memory_mb']:.1f} MB")
-            print(f"  Пиковый CPU: {usage['peak_cpu_percent']:.1f}%")
+            lines.append(f"\nИспользование ресурсов:")
+            lines.append(f"  Пиковая память: {usage['peak_memory_mb']:.1f} MB")
+            lines.append(f"  Средняя память: {usage['average_memory_mb']:.1f} MB")
+            lines.append(f"  Пиковый CPU: {usage['peak_cpu_percent']:.1f}%")
+        
+        _write_lines(lines)
 
 
 # Точка входа для CLI
@@ -2,9 +2,9 @@
 Модели данных для Rate Limit Optimizer
 """
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, NamedTuple, Optional, Any, Union
 from enum import Enum
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 
 
 class AuthType(str, Enum):
@@ -30,6 +30,14 @@ class CircuitBreakerState(str, Enum):
     HALF_OPEN = "half_open"
 
 
+class JitterMode(str, Enum):
+    """Режимы jitter для retry задержек"""
+    NONE = "none"
+    FULL = "full"
+    EQUAL = "equal"
+    DECORRELATED = "decorrelated"
+
+
 class RateLimit(BaseModel):
     """Модель rate limit"""
     limit: int = Field(..., gt=0, description="Максимальное количество запросов")
@@ -37,6 +45,10 @@ class RateLimit(BaseModel):
     reset_time: Optional[datetime] = Field(None, description="Время сброса лимита")
     window_seconds: int = Field(..., gt=0, description="Временное окно в секундах")
     detected_via: DetectionMethod = Field(..., description="Метод определения лимита")
+    window_from_server: bool = Field(
+        True, exclude=True,
+        description="Окно указано сервером явно, а не принято по умолчанию"
+    )
     
     @field_validator('remaining')
     @classmethod
@@ -263,6 +275,8 @@ class MultiTierDetection(BaseModel):
     """Настройки многоуровневого определения"""
     enabled: bool = Field(default=True)
     test_all_tiers: bool = Field(default=False)
+    # Тестировать уровни, даже если их лимит уже явно указан в заголовках
+    force_tier_testing: bool = Field(default=False)
     tiers_to_test: List[RateLimitTier] = Field(min_length=1)
 
 
@@ -352,6 +366,44 @@ class RetryPolicy(BaseModel):
     retry_on_codes: List[int] = Field(default=[429, 502, 503, 504])
     retry_on_timeout: bool = Field(default=True)
     jitter: bool = Field(default=True)
+    jitter_mode: JitterMode = Field(default=JitterMode.FULL)
+    
+    # Предвычисленные таблицы вместе с полями, из которых они построены:
+    # при изменении полей (присваиванием, model_copy или на месте) пересчитываются
+    _codes_cache: Optional[tuple] = PrivateAttr(default=None)
+    _delays_cache: Optional[tuple] = PrivateAttr(default=None)
+    
+    @property
+    def retry_codes_set(self) -> frozenset:
+        """retry_on_codes как множество для проверки за O(1)"""
+        key = tuple(self.retry_on_codes)
+        cached = self._codes_cache
+        if cached is None or cached[0] != key:
+            cached = self._codes_cache = (key, frozenset(key))
+        return cached[1]
+    
+    def _delay_tables(self) -> tuple:
+        """Экспоненциальные и линейные задержки для текущих полей политики"""
+        key = (self.max_retries, self.base_delay, self.backoff_multiplier, self.max_delay)
+        cached = self._delays_cache
+        if cached is None or cached[0] != key:
+            attempts = range(self.max_retries + 1)
+            cached = self._delays_cache = (
+                key,
+                tuple(min(self.base_delay * self.backoff_multiplier ** i, self.max_delay) for i in attempts),
+                tuple(min(self.base_delay * (i + 1), self.max_delay) for i in attempts)
+            )
+        return cached
+    
+    @property
+    def exponential_delays(self) -> tuple:
+        """Ограниченные max_delay экспоненциальные задержки по номеру попытки (с 0)"""
+        return self._delay_tables()[1]
+    
+    @property
+    def linear_delays(self) -> tuple:
+        """Ограниченные max_delay линейные задержки по номеру попытки (с 0)"""
+        return self._delay_tables()[2]
 
 
 class LoggingConfig(BaseModel):
@@ -383,6 +435,16 @@ class RequestError(BaseModel):
     should_retry: bool = Field(default=False)
 
 
+class RetryReason(NamedTuple):
+    """Причина повтора; текст формируется только при str()"""
+    attempt: int
+    exc_name: str
+    delay: float
+    
+    def __str__(self) -> str:
+        return f"Attempt {self.attempt}: {self.exc_name} - retry in {self.delay:.1f}s"
+
+
 class RetryResult(BaseModel):
     """Результат выполнения с повторами"""
     success: bool
@@ -390,7 +452,7 @@ class RetryResult(BaseModel):
     final_response: Optional[Dict[str, Any]] = None
     final_error: Optional[str] = None
     total_duration: float = Field(ge=0)
-    retry_reasons: List[str] = Field(default_factory=list)
+    retry_reasons: List[RetryReason] = Field(default_factory=list)
 
 
 class ErrorStats(BaseModel):
@@ -218,7 +218,41 @@ class TestAIIntegrationWithOpenRouter:
                 )
             
             assert "rate limit" in str(exc_info.value).lower()
-    
+
+    @pytest.mark.asyncio
+    async def test_openrouter_client_retries_server_error(self, mock_openrouter_response):
+        """Тест повтора запроса после временной ошибки сервера OpenRouter"""
+        client = OpenRouterClient(api_key="test-api-key", base_backoff=0.01)
+
+        with aioresponses() as m:
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=503,
+                payload={"error": "Service unavailable"}
+            )
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response
+            )
+
+            response = await client.chat_completion(
+                model="anthropic/claude-3.5-sonnet",
+                messages=[{"role": "user", "content": "test"}]
+            )
+            await client.close()
+
+        assert response["id"] == mock_openrouter_response["id"]
+
+    def test_openrouter_backoff_capped_after_jitter(self):
+        """Тест: задержка с jitter не превышает max_backoff"""
+        client = OpenRouterClient(api_key="test-api-key", base_backoff=1.0, max_backoff=4.0)
+
+        with patch("rate_limit_optimizer.ai.random.uniform", return_value=1.0):
+            assert client._backoff_delay(1) == 3.0
+            assert client._backoff_delay(2) == 4.0
+            assert client._backoff_delay(10) == 4.0
+
     @pytest.mark.asyncio
     async def test_ai_recommender_full_flow(self, sample_detection_results, api_context, mock_openrouter_response):
         """Тест полного цикла генерации AI рекомендаций"""
@@ -318,7 +352,144 @@ class TestAIIntegrationWithOpenRouter:
             # Проверяем что результаты идентичны (из кэша)
             assert recommendations1.analysis.optimal_usage_strategy == recommendations2.analysis.optimal_usage_strategy
             assert recommendations1.timestamp == recommendations2.timestamp  # Должны быть из кэша
-    
+
+    @pytest.mark.asyncio
+    async def test_ai_recommendations_persistent_cache(self, sample_detection_results, api_context, mock_openrouter_response, temp_dir):
+        """Тест общего персистентного кэша между экземплярами AIRecommender"""
+        first = AIRecommender(
+            openrouter_api_key="test-api-key",
+            cache_recommendations=True,
+            cache_dir=temp_dir
+        )
+
+        with aioresponses() as m:
+            # API отвечает только один раз
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response
+            )
+
+            recommendations1 = await first.generate_recommendations(
+                test_results=sample_detection_results,
+                api_context=api_context
+            )
+            await first.aclose()
+
+            # Новый экземпляр (как после перезапуска) - должен взять результат с диска
+            second = AIRecommender(
+                openrouter_api_key="test-api-key",
+                cache_recommendations=True,
+                cache_dir=temp_dir
+            )
+            recommendations2 = await second.generate_recommendations(
+                test_results=sample_detection_results,
+                api_context=api_context
+            )
+            await second.aclose()
+
+        assert recommendations1.timestamp == recommendations2.timestamp
+        assert recommendations1.analysis.optimal_usage_strategy == recommendations2.analysis.optimal_usage_strategy
+
+    @pytest.mark.asyncio
+    async def test_ai_persistent_cache_corrupt_entry_is_miss(self, sample_detection_results, api_context, mock_openrouter_response, temp_dir):
+        """Тест: поврежденная запись персистентного кэша считается промахом и перезаписывается"""
+        recommender = AIRecommender(
+            openrouter_api_key="test-api-key",
+            cache_recommendations=True,
+            cache_dir=temp_dir
+        )
+        cache_key = recommender._generate_cache_key(sample_detection_results, api_context)
+        recommender._store.set(cache_key, '{"generated_by": "old-schema"}', 3600)
+
+        with aioresponses() as m:
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response
+            )
+
+            recommendations = await recommender.generate_recommendations(
+                test_results=sample_detection_results,
+                api_context=api_context
+            )
+
+        # Ответ получен от API, а не из поврежденной записи
+        assert recommendations.analysis.optimal_usage_strategy
+        stored = AIRecommendations.model_validate_json(recommender._store.get(cache_key))
+        assert stored.analysis == recommendations.analysis
+        await recommender.aclose()
+
+    def test_cache_key_quantizes_rate_relatively(self, sample_detection_results, api_context):
+        """Тест: ключ кэша устойчив к небольшому относительному дрейфу частоты"""
+        recommender = AIRecommender(
+            openrouter_api_key="test-api-key",
+            cache_recommendations=False
+        )
+
+        def key_for(rate: int) -> str:
+            results = sample_detection_results.model_copy(update={"recommended_rate": rate})
+            return recommender._generate_cache_key(results, api_context)
+
+        # ~2% дрейфа не меняет ключ
+        assert key_for(500) == key_for(510)
+        # На малых частотах разница в 2 раза не схлопывается в одну корзину
+        assert key_for(2) != key_for(4)
+        assert key_for(100) != key_for(150)
+
+    @pytest.mark.asyncio
+    async def test_ai_concurrent_identical_requests_coalesced(self, sample_detection_results, api_context, mock_openrouter_response):
+        """Тест объединения одинаковых параллельных запросов в один вызов AI"""
+        recommender = AIRecommender(
+            openrouter_api_key="test-api-key",
+            cache_recommendations=False
+        )
+
+        with aioresponses() as m:
+            # Только один ответ: второй HTTP запрос привел бы к fallback
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response
+            )
+
+            results = await asyncio.gather(*[
+                recommender.generate_recommendations(
+                    test_results=sample_detection_results,
+                    api_context=api_context
+                )
+                for _ in range(3)
+            ])
+            await recommender.aclose()
+
+        assert all(r.generated_by != "fallback_generator" for r in results)
+        assert len({r.timestamp for r in results}) == 1
+        assert recommender._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_ai_recommender_context_manager_reuses_session(self, sample_detection_results, api_context, mock_openrouter_response):
+        """Тест переиспользования одной HTTP сессии внутри async with"""
+        with aioresponses() as m:
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response,
+                repeat=True
+            )
+
+            async with AIRecommender(openrouter_api_key="test-api-key", cache_recommendations=False) as recommender:
+                session = recommender.client.session
+                for _ in range(2):
+                    recommendations = await recommender.generate_recommendations(
+                        test_results=sample_detection_results,
+                        api_context=api_context
+                    )
+                    assert recommendations.generated_by != "fallback_generator"
+                    assert recommender.client.session is session
+
+        assert session.closed
+        assert recommender.client.session is None
+
     @pytest.mark.asyncio
     async def test_ai_recommendations_fallback_on_error(self, sample_detection_results, api_context):
         """Тест fallback рекомендаций при ошибке AI API"""
@@ -402,7 +573,36 @@ class TestAIIntegrationWithOpenRouter:
             # Проверяем что финальные рекомендации учитывают все модели
             final_strategy = consensus_recommendations.final_recommendations.optimal_usage_strategy
             assert "req/10s" in final_strategy
-    
+
+    @pytest.mark.asyncio
+    async def test_recommendation_generator_first_valid_mode(self, sample_detection_results, api_context, mock_openrouter_response):
+        """Тест режима first_valid: достаточно первого корректного ответа"""
+        models = ["anthropic/claude-3.5-sonnet", "openai/gpt-4-turbo"]
+
+        generator = RecommendationGenerator(
+            openrouter_api_key="test-api-key",
+            models=models,
+            consensus_mode="first_valid"
+        )
+
+        with aioresponses() as m:
+            m.post(
+                "https://openrouter.ai/api/v1/chat/completions",
+                status=200,
+                payload=mock_openrouter_response,
+                repeat=True
+            )
+
+            recommendations = await generator.generate_consensus_recommendations(
+                test_results=sample_detection_results,
+                api_context=api_context
+            )
+            await generator.aclose()
+
+        assert recommendations.generated_by.startswith("first_valid_")
+        assert len(recommendations.model_responses) == 1
+        assert recommendations.analysis.optimal_usage_strategy
+
     @pytest.mark.asyncio
     async def test_ai_recommendations_with_environment_variables(self, sample_detection_results, api_context):
         """Тест использования переменных окружения для AI настроек"""
@@ -211,6 +211,46 @@ class TestConfigIntegration:
             # Проверяем что переменная окружения правильно подставляется
             assert config.ai_recommendations.api_key_env == "OPENROUTER_API_KEY"
     
+    def test_config_reload_picks_up_env_changes(self, sample_config_path: Path):
+        """Тест: повторная загрузка неизмененного файла видит новые значения env"""
+        config_data = json.loads(sample_config_path.read_text())
+        config_data["description"] = "${RLO_TEST_DESCRIPTION}"
+        sample_config_path.write_text(json.dumps(config_data))
+        
+        manager = ConfigManager(sample_config_path)
+        
+        with patch.dict('os.environ', {'RLO_TEST_DESCRIPTION': 'first'}):
+            assert manager.load_config().description == "first"
+        
+        with patch.dict('os.environ', {'RLO_TEST_DESCRIPTION': 'second'}):
+            assert manager.load_config().description == "second"
+    
+    def test_is_ai_enabled_reflects_env_changes(self, sample_config_path: Path):
+        """Тест: is_ai_enabled не использует устаревшее значение env"""
+        manager = ConfigManager(sample_config_path)
+        manager.load_config()
+        
+        with patch.dict('os.environ', {'OPENROUTER_API_KEY': 'key'}):
+            assert manager.is_ai_enabled() is True
+        
+        with patch.dict('os.environ', {}, clear=True):
+            assert manager.is_ai_enabled() is False
+
+    def test_get_strategy_reflects_in_place_changes(self, sample_config_path: Path):
+        """Тест: правка словаря стратегии на месте не возвращает устаревшую стратегию"""
+        config = ConfigManager(sample_config_path).load_config()
+
+        strategy = config.get_strategy("multi_tier_ramp")
+        assert strategy.stop_on_first_limit is True
+        assert config.get_strategy("multi_tier_ramp") is strategy
+
+        config.optimization_strategies["multi_tier_ramp"]["stop_on_first_limit"] = False
+        config.optimization_strategies["multi_tier_ramp"]["tier_order"].append("minute")
+
+        updated = config.get_strategy("multi_tier_ramp")
+        assert updated.stop_on_first_limit is False
+        assert updated.tier_order == ["10_seconds", "minute"]
+
     def test_config_serialization_roundtrip(self, sample_config_path: Path):
         """Тест сериализации и десериализации конфигурации"""
         # Загружаем конфигурацию
@@ -327,6 +367,61 @@ class TestConfigIntegration:
         assert tier1.window_seconds < tier2.window_seconds
 
 
+
+class TestConfigMerge:
+    """Тесты слияния конфигураций"""
+    
+    @pytest.fixture
+    def manager(self) -> ConfigManager:
+        return ConfigManager()
+    
+    @pytest.fixture
+    def base_config(self, manager: ConfigManager) -> Config:
+        return manager.create_default_config()
+    
+    def test_merge_nested_section(self, manager: ConfigManager, base_config: Config):
+        """Тест: вложенное поле переопределяется, соседние сохраняются"""
+        merged = manager.merge_configs(base_config, {
+            "detection_settings": {"safety_settings": {"safety_margin_percent": 25}}
+        })
+        
+        safety = merged.detection_settings.safety_settings
+        assert safety.safety_margin_percent == 25
+        assert safety.backoff_multiplier == base_config.detection_settings.safety_settings.backoff_multiplier
+        assert merged.detection_settings.multi_tier_detection.tiers_to_test[0].name == "10_seconds"
+        assert base_config.detection_settings.safety_settings.safety_margin_percent == 10
+    
+    def test_merge_rejects_invalid_override(self, manager: ConfigManager, base_config: Config):
+        """Тест: невалидное переопределение отклоняется"""
+        with pytest.raises(ValidationError):
+            manager.merge_configs(base_config, {
+                "detection_settings": {"safety_settings": {"safety_margin_percent": 99}}
+            })
+        
+        with pytest.raises(ValidationError):
+            manager.merge_configs(base_config, {
+                "detection_settings": {"multi_tier_detection": {"tiers_to_test": []}}
+            })
+    
+    def test_merge_does_not_share_mutable_values(self, manager: ConfigManager, base_config: Config):
+        """Тест: изменение результата слияния не затрагивает base_config и override"""
+        override = {
+            "optimization_strategies": {
+                "multi_tier_ramp": {"stop_on_first_limit": False},
+                "header_analysis": {"priority_headers": ["X-RateLimit-Limit"]}
+            }
+        }
+        merged = manager.merge_configs(base_config, override)
+        
+        merged.optimization_strategies["multi_tier_ramp"]["tier_order"].append("minute")
+        merged.optimization_strategies["header_analysis"]["priority_headers"].append("Retry-After")
+        
+        assert base_config.optimization_strategies["multi_tier_ramp"]["tier_order"] == ["10_seconds"]
+        assert base_config.optimization_strategies["multi_tier_ramp"]["stop_on_first_limit"] is True
+        assert override["optimization_strategies"]["header_analysis"]["priority_headers"] == ["X-RateLimit-Limit"]
+        assert merged.optimization_strategies["multi_tier_ramp"]["stop_on_first_limit"] is False
+
+
 @pytest.mark.integration
 class TestConfigFileOperations:
     """Тесты операций с файлами конфигурации"""
@@ -361,3 +456,35 @@ class TestConfigFileOperations:
         
         # Восстанавливаем права для cleanup
         config_file.chmod(0o644)
+
+    def test_compatibility_check_does_not_validate_schema(self, tmp_path: Path):
+        """Тест: ошибки схемы не делают конфигурацию несовместимой"""
+        config_file = tmp_path / "schema_invalid.json"
+        config_file.write_text(json.dumps({
+            "version": "1.0.0",
+            "target_sites": {"bad": {"base_url": "not-a-url", "endpoints": []}},
+            "detection_settings": {"success_threshold": 5},
+            "ai_recommendations": {"enabled": False}
+        }))
+
+        report = ConfigManager().check_config_compatibility(config_file)
+
+        assert report["compatible"] is True
+        assert report["schema_checked"] is False
+        assert report["errors"] == []
+        with pytest.raises(ValueError):
+            ConfigManager(config_file).load_config()
+
+    def test_compatibility_check_requires_detection_settings(self, tmp_path: Path):
+        """Тест: отсутствие detection_settings делает конфигурацию несовместимой"""
+        config_file = tmp_path / "no_detection.json"
+        config_file.write_text(json.dumps({
+            "version": "1.0.0",
+            "target_sites": {"site": {"base_url": "https://api.test.com", "endpoints": ["/v1"]}},
+            "ai_recommendations": {"enabled": False}
+        }))
+
+        report = ConfigManager().check_config_compatibility(config_file)
+
+        assert report["compatible"] is False
+        assert report["errors"] == ["Не указаны настройки определения лимитов"]
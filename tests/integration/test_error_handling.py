@@ -17,13 +17,16 @@ from rate_limit_optimizer.error_handling import (
     ExponentialBackoffRetry,
     LinearBackoffRetry,
     CircuitBreaker,
-    ErrorClassifier
+    ErrorClassifier,
+    exponential_delay,
+    linear_delay
 )
 from rate_limit_optimizer.models import (
     RequestError,
     RetryResult,
     ErrorStats,
-    CircuitBreakerState
+    CircuitBreakerState,
+    JitterMode
 )
 from rate_limit_optimizer.exceptions import (
     RateLimitExceeded,
@@ -428,7 +431,52 @@ class TestErrorHandlingEdgeCases:
             # Должна быть только одна попытка без повторов
             assert result.success is False
             assert result.attempts_made == 1
-    
+
+    @pytest.mark.asyncio
+    async def test_linear_retry_retries_unclassified_errors(self):
+        """Тест: линейный backoff повторяет любые исключения, экспоненциальный - нет"""
+        policy = RetryPolicy(max_retries=2, base_delay=0.01, jitter=False)
+
+        async def failing_request():
+            raise ValueError("Unclassified error")
+
+        linear_result = await LinearBackoffRetry(policy=policy).execute_with_retry(failing_request)
+        assert linear_result.success is False
+        assert linear_result.attempts_made == policy.max_retries + 1
+        assert isinstance(linear_result.final_error, ValueError)
+
+        exponential_result = await ExponentialBackoffRetry(policy=policy).execute_with_retry(failing_request)
+        assert exponential_result.attempts_made == 1
+
+    def test_retry_policy_tables_follow_field_changes(self):
+        """Тест: предвычисленные таблицы политики не устаревают после изменения полей"""
+        policy = RetryPolicy(max_retries=2, base_delay=1.0, max_delay=60.0, retry_on_codes=[429])
+        assert policy.exponential_delays == (1.0, 2.0, 4.0)
+        assert policy.linear_delays == (1.0, 2.0, 3.0)
+        assert policy.retry_codes_set == {429}
+
+        policy.max_retries = 4
+        policy.base_delay = 2.0
+        policy.retry_on_codes.append(503)
+
+        assert policy.exponential_delays == (2.0, 4.0, 8.0, 16.0, 32.0)
+        assert policy.linear_delays == (2.0, 4.0, 6.0, 8.0, 10.0)
+        assert policy.retry_codes_set == {429, 503}
+
+        copied = policy.model_copy(update={"max_delay": 5.0})
+        assert copied.exponential_delays == (2.0, 4.0, 5.0, 5.0, 5.0)
+        assert policy.exponential_delays[-1] == 32.0
+
+    def test_delay_functions_outside_policy_table(self):
+        """Тест: номер попытки вне предвычисленной таблицы не вызывает IndexError"""
+        policy = RetryPolicy(max_retries=1, base_delay=1.0, max_delay=10.0, jitter=False)
+        error = ServerError("Server error")
+
+        assert exponential_delay(policy, 3, 0.0, error) == 4.0
+        assert exponential_delay(policy, 10_000, 0.0, error) == 10.0
+        assert linear_delay(policy, 5, 0.0, error) == 5.0
+        assert linear_delay(policy, 0, 0.0, error) == 1.0
+
     @pytest.mark.asyncio
     async def test_circuit_breaker_with_zero_failure_threshold(self):
         """Тест circuit breaker с нулевым порогом ошибок"""
@@ -446,6 +494,128 @@ class TestErrorHandlingEdgeCases:
         
         assert circuit_breaker.state == CircuitBreakerState.OPEN
     
+    @pytest.mark.asyncio
+    async def test_circuit_breaker_ignores_stale_results(self):
+        """Тест: ответ, допущенный в CLOSED, не засчитывается как half-open проба"""
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=1,
+            recovery_timeout=0.0,
+            success_threshold=2,
+            half_open_max_calls=5
+        )
+        release = asyncio.Event()
+        
+        async def slow_success():
+            await release.wait()
+            return {"success": True}
+        
+        async def fast_success():
+            return {"success": True}
+        
+        async def failing_request():
+            raise ServerError("Always fails")
+        
+        # Медленный запрос допущен в состоянии CLOSED
+        slow_task = asyncio.create_task(circuit_breaker.call(slow_success))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(ServerError):
+            await circuit_breaker.call(failing_request)
+        assert circuit_breaker.state == CircuitBreakerState.OPEN
+        
+        # Первая проба переводит breaker в HALF_OPEN
+        await circuit_breaker.call(fast_success)
+        assert circuit_breaker.state == CircuitBreakerState.HALF_OPEN
+        
+        release.set()
+        await slow_task
+        
+        assert circuit_breaker.state == CircuitBreakerState.HALF_OPEN
+        assert circuit_breaker.success_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_circuit_breaker_half_open_gradual_recovery(self):
+        """Тест: в HALF_OPEN пропускная способность растет с каждой успешной пробой"""
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=1,
+            recovery_timeout=0.0,
+            success_threshold=4,
+            half_open_max_calls=10
+        )
+        release = asyncio.Event()
+        
+        async def slow_success():
+            await release.wait()
+            return {"success": True}
+        
+        async def failing_request():
+            raise ServerError("Always fails")
+        
+        with pytest.raises(ServerError):
+            await circuit_breaker.call(failing_request)
+        assert circuit_breaker.state == CircuitBreakerState.OPEN
+        
+        # Первая проба пропускается, пока она выполняется остальные отклоняются
+        probe = asyncio.create_task(circuit_breaker.call(slow_success))
+        await asyncio.sleep(0)
+        assert circuit_breaker.state == CircuitBreakerState.HALF_OPEN
+        
+        with pytest.raises(Exception) as exc_info:
+            await circuit_breaker.call(slow_success)
+        assert "circuit breaker" in str(exc_info.value).lower()
+        
+        release.set()
+        await probe
+        
+        assert circuit_breaker.current_capacity == pytest.approx(0.25)
+        assert circuit_breaker.state == CircuitBreakerState.HALF_OPEN
+    
+    @pytest.mark.asyncio
+    async def test_circuit_breaker_full_cycle_with_late_result(self):
+        """Тест цикла CLOSED -> OPEN -> HALF_OPEN -> CLOSED с запоздавшим ответом"""
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=1,
+            recovery_timeout=0.0,
+            success_threshold=2,
+            half_open_max_calls=5
+        )
+        assert circuit_breaker.state == CircuitBreakerState.CLOSED
+        release = asyncio.Event()
+        
+        async def slow_failure():
+            await release.wait()
+            raise ServerError("Late failure")
+        
+        async def fast_success():
+            return {"success": True}
+        
+        async def failing_request():
+            raise ServerError("Always fails")
+        
+        # Медленный запрос допущен в исходном CLOSED
+        slow_task = asyncio.create_task(circuit_breaker.call(slow_failure))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(ServerError):
+            await circuit_breaker.call(failing_request)
+        assert circuit_breaker.state == CircuitBreakerState.OPEN
+        
+        # Пробы всегда пропускаются, чтобы результат не зависел от случайности
+        with patch("rate_limit_optimizer.error_handling._unit_random", return_value=0.0):
+            await circuit_breaker.call(fast_success)
+            assert circuit_breaker.state == CircuitBreakerState.HALF_OPEN
+            
+            await circuit_breaker.call(fast_success)
+        assert circuit_breaker.state == CircuitBreakerState.CLOSED
+        
+        # Ошибка из предыдущего поколения не переоткрывает breaker
+        release.set()
+        with pytest.raises(ServerError):
+            await slow_task
+        
+        assert circuit_breaker.state == CircuitBreakerState.CLOSED
+        assert circuit_breaker.failure_count == 0
+    
     @pytest.mark.asyncio
     async def test_nested_retry_handlers(self):
         """Тест вложенных retry handlers"""
@@ -477,3 +647,27 @@ class TestErrorHandlingEdgeCases:
             # Но из-за вложенности может быть меньше
             assert result.success is False
             assert result.attempts_made >= 2
+    
+    def test_full_jitter_delay_within_cap(self):
+        """Тест full jitter: задержка равномерно распределена в [0, cap]"""
+        policy = RetryPolicy(base_delay=1.0, backoff_multiplier=2.0, max_delay=5.0, jitter=True)
+        retry_handler = ExponentialBackoffRetry(policy=policy)
+        
+        assert policy.jitter_mode == JitterMode.FULL
+        
+        for attempt in range(1, 6):
+            cap = min(1.0 * 2.0 ** (attempt - 1), 5.0)
+            for _ in range(50):
+                delay = retry_handler._calculate_delay(attempt, ServerError("boom"))
+                assert 0 <= delay <= cap
+    
+    def test_decorrelated_jitter_delay_bounds(self):
+        """Тест decorrelated jitter: задержка в [base_delay, prev*3] и не больше max_delay"""
+        policy = RetryPolicy(base_delay=0.5, max_delay=4.0, jitter_mode=JitterMode.DECORRELATED)
+        retry_handler = ExponentialBackoffRetry(policy=policy)
+        
+        delay = 0.0
+        for attempt in range(1, 10):
+            prev_delay = delay
+            delay = retry_handler._calculate_delay(attempt, ServerError("boom"), prev_delay)
+            assert policy.base_delay <= delay <= min(policy.max_delay, max(prev_delay, policy.base_delay) * 3)
@@ -628,3 +628,73 @@ class TestMultiTierStrategies:
         # Проверяем что все стратегии нашли лимиты
         for strategy_name, results in performance_results.items():
             assert results["limits_found"] > 0
+
+
+class TestHeaderTierSkipping:
+    """Тесты пропуска уровней, найденных в заголовках"""
+    
+    @pytest.fixture
+    def minute_tier(self) -> RateLimitTier:
+        return RateLimitTier(
+            name="minute",
+            window_seconds=60,
+            start_rate=1,
+            max_rate=100,
+            increment=10,
+            test_duration_minutes=0.1
+        )
+    
+    async def _tested_tiers(self, headers: Dict[str, str], tier: RateLimitTier, force_test: bool = False):
+        """Уровни, переданные на тестирование после анализа заголовков"""
+        detector = MultiTierDetector()
+        detector._analyze_headers_many = AsyncMock(
+            return_value=HeaderAnalyzer().extract_rate_limits(headers)
+        )
+        detector._test_tiers = AsyncMock(return_value=[])
+        
+        await detector.detect_all_rate_limits(
+            base_url="https://api.test.com",
+            endpoint="/v1/test",
+            tiers_to_test=[tier],
+            force_test=force_test
+        )
+        
+        if not detector._test_tiers.await_count:
+            return []
+        return detector._test_tiers.await_args.args[1]
+    
+    @pytest.mark.asyncio
+    async def test_default_window_does_not_skip_tier(self, minute_tier):
+        """Тест: окно 60s, принятое по умолчанию, не отменяет тестирование минутного уровня"""
+        tested = await self._tested_tiers({"X-RateLimit-Limit": "100"}, minute_tier)
+        
+        assert tested == [minute_tier]
+    
+    @pytest.mark.asyncio
+    async def test_explicit_window_skips_tier(self, minute_tier):
+        """Тест: явно указанное сервером окно отменяет тестирование уровня"""
+        tested = await self._tested_tiers(
+            {"X-RateLimit-Limit": "100", "X-RateLimit-Window": "60"}, minute_tier
+        )
+        
+        assert tested == []
+    
+    @pytest.mark.asyncio
+    async def test_force_test_overrides_skip(self, minute_tier):
+        """Тест: force_test тестирует уровень несмотря на заголовки"""
+        tested = await self._tested_tiers(
+            {"X-RateLimit-Limit-Minute": "100"}, minute_tier, force_test=True
+        )
+        
+        assert tested == [minute_tier]
+    
+    def test_explicit_tier_header_preferred_over_default_window(self):
+        """Тест: многоуровневый заголовок минуты вытесняет базовый лимит с окном по умолчанию"""
+        limits = HeaderAnalyzer().extract_rate_limits({
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Limit-Minute": "80"
+        })
+        
+        assert len(limits) == 1
+        assert limits[0].limit == 80
+        assert limits[0].window_from_server is True
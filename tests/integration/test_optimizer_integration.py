@@ -0,0 +1,158 @@
+"""
+Интеграционные тесты основного класса Rate Limit Optimizer
+"""
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from cachetools import TTLCache
+
+from rate_limit_optimizer.config import ConfigManager
+from rate_limit_optimizer.main import RateLimitOptimizer
+from rate_limit_optimizer.models import (
+    AuthConfig,
+    AuthType,
+    MultiTierResult,
+    TargetSite
+)
+from rate_limit_optimizer.exceptions import ConfigurationError
+
+
+def _make_optimizer(**kwargs) -> RateLimitOptimizer:
+    """Оптимизатор с конфигурацией по умолчанию без сетевых компонентов"""
+    optimizer = RateLimitOptimizer(
+        enable_ai=False,
+        enable_performance_monitoring=False,
+        enable_error_handling=False,
+        **kwargs
+    )
+    optimizer.config_manager = ConfigManager()
+    optimizer.config_manager._config = optimizer.config_manager.create_default_config()
+    optimizer._initialized = True
+    return optimizer
+
+
+class TestOptimizerSiteResolution:
+    """Тесты разрешения конфигураций сайтов"""
+
+    @pytest.fixture
+    def optimizer(self) -> RateLimitOptimizer:
+        return _make_optimizer()
+
+    def test_removed_site_is_not_resolved_from_cache(self, optimizer: RateLimitOptimizer):
+        """Тест: удаленный через ConfigManager сайт больше не разрешается"""
+        site_config, _ = optimizer._resolve_site("test_site")
+        assert site_config.base_url == "https://api.test.com"
+
+        assert optimizer.config_manager.remove_site_config("test_site") is True
+
+        with pytest.raises(ConfigurationError):
+            optimizer._resolve_site("test_site")
+
+    def test_replaced_site_is_resolved_to_new_config(self, optimizer: RateLimitOptimizer):
+        """Тест: замененный через ConfigManager сайт разрешается в новую конфигурацию"""
+        optimizer._resolve_site("test_site")
+
+        new_site = TargetSite(
+            base_url="https://api.other.com",
+            endpoints=["/v2/test"],
+            auth=AuthConfig(type=AuthType.NONE)
+        )
+        optimizer.config_manager.add_site_config("test_site", new_site)
+
+        site_config, _ = optimizer._resolve_site("test_site")
+        assert site_config is new_site
+
+    def test_sites_grouped_by_host(self, optimizer: RateLimitOptimizer):
+        """Тест: сайты с разными путями на одном хосте попадают в одну группу"""
+        for name, base_url in (
+            ("v1", "https://API.x.com/v1"),
+            ("v2", "https://api.x.com/v2/"),
+            ("other", "https://api.y.com/v1"),
+        ):
+            optimizer.config_manager.add_site_config(name, TargetSite(
+                base_url=base_url,
+                endpoints=["/test"],
+                auth=AuthConfig(type=AuthType.NONE)
+            ))
+
+        assert optimizer._site_group_key("v1") == optimizer._site_group_key("v2") == "api.x.com"
+        assert optimizer._site_group_key("other") == "api.y.com"
+
+
+class TestOptimizerDetectionCache:
+    """Тесты кэша результатов определения"""
+
+    @pytest.fixture
+    def clock(self):
+        """Управляемые часы для TTL кэша"""
+        return [0.0]
+
+    @pytest.fixture
+    def optimizer(self, clock) -> RateLimitOptimizer:
+        optimizer = _make_optimizer(detection_cache_ttl=60.0)
+        optimizer._detection_cache = TTLCache(maxsize=16, ttl=60.0, timer=lambda: clock[0])
+        optimizer._detect_limits_impl = AsyncMock(side_effect=lambda *args: MultiTierResult(
+            base_url="https://api.test.com",
+            endpoint="/v1/test",
+            most_restrictive="10_seconds",
+            recommended_rate=10,
+            limits_found=1,
+            total_requests=20,
+            test_duration_seconds=30.0,
+            confidence_score=0.9,
+            endpoints_tested=["/v1/test"]
+        ))
+        return optimizer
+
+    def test_cache_disabled_by_default(self):
+        """Тест: без detection_cache_ttl кэш выключен"""
+        optimizer = _make_optimizer()
+
+        assert optimizer._detection_cache is None
+        assert optimizer.has_cache("test_site") is False
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_returns_copy(self, optimizer: RateLimitOptimizer):
+        """Тест: повторный вызов берется из кэша и возвращает отдельную копию"""
+        first = await optimizer.detect_rate_limits("test_site")
+        assert optimizer.has_cache("test_site") is True
+
+        second = await optimizer.detect_rate_limits("test_site")
+
+        assert optimizer._detect_limits_impl.await_count == 1
+        assert second == first
+        assert second is not first
+
+        second.detection_results.endpoints_tested.append("/mutated")
+        third = await optimizer.detect_rate_limits("test_site")
+        assert third.detection_results.endpoints_tested == ["/v1/test"]
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_on_changed_arguments(self, optimizer: RateLimitOptimizer):
+        """Тест: другие аргументы не используют кэшированный результат"""
+        await optimizer.detect_rate_limits("test_site")
+
+        await optimizer.detect_rate_limits("test_site", strategy="header_analysis")
+        await optimizer.detect_rate_limits("test_site", validate_consistency=False)
+        assert optimizer._detect_limits_impl.await_count == 3
+
+        # С включенным AI результат без рекомендаций не подходит
+        optimizer.ai_recommender = MagicMock()
+        optimizer._generate_ai_recommendations = AsyncMock(return_value=None)
+        await optimizer.detect_rate_limits("test_site")
+        assert optimizer._detect_limits_impl.await_count == 4
+        optimizer._generate_ai_recommendations.assert_awaited_once()
+
+        await optimizer.detect_rate_limits("test_site", generate_ai_recommendations=False)
+        assert optimizer._detect_limits_impl.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_cache_entry_expires(self, optimizer: RateLimitOptimizer, clock):
+        """Тест: по истечении TTL определение выполняется заново"""
+        await optimizer.detect_rate_limits("test_site")
+
+        clock[0] += 61.0
+        assert optimizer.has_cache("test_site") is False
+
+        await optimizer.detect_rate_limits("test_site")
+        assert optimizer._detect_limits_impl.await_count == 2
@@ -22,7 +22,8 @@ from rate_limit_optimizer.models import (
     RateLimitTier,
     MultiTierResult,
     TierTestResult,
-    DetectionResult
+    DetectionResult,
+    DetectionMethod
 )
 
 
@@ -108,6 +109,44 @@ class TestRateLimitDetectionIntegration:
         assert day_limit.limit == 100000
         assert day_limit.remaining == 99900
     
+    @pytest.mark.asyncio
+    async def test_header_analyzer_plural_tier_suffixes(self):
+        """Тест разбора многоуровневых заголовков с окнами во множественном числе"""
+        analyzer = HeaderAnalyzer()
+        
+        limits = analyzer.extract_rate_limits({
+            "X-RateLimit-Limit-Minutes": "100",
+            "X-RateLimit-Remaining-Minutes": "90",
+            "X-RateLimit-Limit-15-Mins": "1000",
+            "X-RateLimit-Limit-Hours": "5000",
+            "X-RateLimit-Remaining-Hrs": "4000",
+            "X-Rate-Limit-Limit-Days": "100000"
+        })
+        by_window = {limit.window_seconds: limit for limit in limits}
+        
+        assert by_window[60].limit == 100
+        assert by_window[60].remaining == 90
+        assert by_window[900].limit == 1000
+        assert by_window[3600].limit == 5000
+        assert by_window[3600].remaining == 4000
+        assert by_window[86400].limit == 100000
+
+    @pytest.mark.asyncio
+    async def test_header_analyzer_role_after_window_not_misread(self):
+        """Тест: заголовок с ролью после окна не принимается за лимит"""
+        analyzer = HeaderAnalyzer()
+
+        limits = analyzer.extract_rate_limits({
+            "X-RateLimit-Limit-Minute": "100",
+            "X-RateLimit-Minute-Remaining": "5",
+            "X-RateLimit-Hour-Reset": "1700000000"
+        })
+
+        assert len(limits) == 1
+        assert limits[0].window_seconds == 60
+        assert limits[0].limit == 100
+        assert limits[0].remaining == 100
+
     @pytest.mark.asyncio
     async def test_header_analyzer_no_limits_found(self, sample_headers_no_limits):
         """Тест когда в заголовках нет информации о лимитах"""
@@ -310,6 +349,78 @@ class TestRateLimitDetectionIntegration:
             assert len(result.endpoints_tested) == len(endpoints)
             assert result.total_requests > len(endpoints)
     
+    @pytest.mark.asyncio
+    async def test_endpoint_rotation_merges_header_limits(self):
+        """Тест объединения лимитов из заголовков всех endpoints"""
+        endpoints = ["/v1/test", "/v1/data"]
+        
+        with aioresponses() as m:
+            m.get(
+                "https://api.test.com/v1/test",
+                status=200,
+                headers={"X-RateLimit-Limit-Minute": "100", "X-RateLimit-Limit-Hour": "5000"}
+            )
+            m.get(
+                "https://api.test.com/v1/data",
+                status=200,
+                headers={"X-RateLimit-Limit-Minute": "40"}
+            )
+            
+            async with MultiTierDetector() as detector:
+                result = await detector.detect_with_endpoint_rotation(
+                    base_url="https://api.test.com",
+                    endpoints=endpoints
+                )
+        
+        # Для каждого окна остается самый строгий лимит
+        assert result.minute_limit.limit == 40
+        assert result.hour_limit.limit == 5000
+        assert result.endpoints_tested == endpoints
+    
+    @pytest.mark.asyncio
+    async def test_tiers_known_from_headers_are_not_tested(self, rate_limit_tier_minute):
+        """Тест что уровни, найденные в заголовках, не тестируются повторно"""
+        with aioresponses() as m:
+            m.get(
+                "https://api.test.com/v1/test",
+                status=200,
+                headers={"X-RateLimit-Limit-Minute": "100"}
+            )
+            
+            async with MultiTierDetector() as detector:
+                result = await detector.detect_all_rate_limits(
+                    base_url="https://api.test.com",
+                    endpoint="/v1/test",
+                    tiers_to_test=[rate_limit_tier_minute]
+                )
+        
+        # Единственный запрос ушел на анализ заголовков
+        assert result.tier_results == []
+        assert result.minute_limit.limit == 100
+
+    @pytest.mark.asyncio
+    async def test_detector_session_lifetime(self):
+        """Тест: без async with сессия закрывается после вызова, с ним - удерживается"""
+        with aioresponses() as m:
+            m.get(
+                "https://api.test.com/v1/test",
+                status=200,
+                headers={"X-RateLimit-Limit-Minute": "100"},
+                repeat=True
+            )
+
+            detector = MultiTierDetector()
+            await detector.detect_all_rate_limits(base_url="https://api.test.com", endpoint="/v1/test")
+            assert detector._session is None
+
+            async with MultiTierDetector() as detector:
+                await detector.detect_all_rate_limits(base_url="https://api.test.com", endpoint="/v1/test")
+                session = detector._session
+                assert session is not None and not session.closed
+
+            assert session.closed
+            assert detector._session is None
+
     @pytest.mark.asyncio
     async def test_rate_limit_detection_with_retry_after(self):
         """Тест обработки заголовка Retry-After при превышении лимита"""
@@ -442,7 +553,70 @@ class TestRateLimitDetectionEdgeCases:
         
         # Некорректные заголовки должны быть проигнорированы
         assert len(limits) == 0 or all(l.limit > 0 for l in limits)
-    
+
+    @pytest.mark.asyncio
+    async def test_reset_in_milliseconds_is_ignored(self):
+        """Тест: reset в миллисекундах не ломает разбор лимита"""
+        analyzer = HeaderAnalyzer()
+
+        limits = analyzer.extract_rate_limits({
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Remaining": "90",
+            "X-RateLimit-Reset": "1700000000000",
+            "X-RateLimit-Limit-Hour": "5000",
+            "X-RateLimit-Reset-Hour": "99999999999999999999"
+        })
+        by_window = {limit.window_seconds: limit for limit in limits}
+
+        assert by_window[60].limit == 100
+        assert by_window[60].remaining == 90
+        assert by_window[60].reset_time is None
+        assert by_window[3600].limit == 5000
+        assert by_window[3600].reset_time is None
+
+    @pytest.mark.asyncio
+    async def test_zero_basic_limit_is_ignored(self):
+        """Тест: нулевой X-RateLimit-Limit не дает лимита и не вызывает ошибку"""
+        analyzer = HeaderAnalyzer()
+
+        assert analyzer.extract_rate_limits({
+            "X-RateLimit-Limit": "0",
+            "X-RateLimit-Remaining": "0"
+        }) == []
+
+    @pytest.mark.asyncio
+    async def test_bad_tier_header_does_not_discard_others(self):
+        """Тест: некорректный многоуровневый заголовок пропускается, остальные разбираются"""
+        analyzer = HeaderAnalyzer()
+
+        limits = analyzer.extract_rate_limits({
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Limit-Minute": "0",
+            "X-RateLimit-Limit-Hour": "5000",
+            "X-RateLimit-Remaining-Hour": "bad",
+            "X-RateLimit-Reset-Hour": "1700000000000",
+            "X-RateLimit-Limit-Day": "100000"
+        })
+        by_window = {limit.window_seconds: limit for limit in limits}
+
+        assert by_window[60].limit == 100
+        assert by_window[3600].limit == 5000
+        assert by_window[3600].remaining == 5000
+        assert by_window[86400].limit == 100000
+
+    def test_zero_limit_in_429_response_falls_back_to_rate(self):
+        """Тест: нулевой X-RateLimit-Limit в ответе 429 заменяется оценкой по частоте"""
+        tester = TierTester()
+
+        limit = tester._extract_limit_from_response(
+            {"headers": {"X-RateLimit-Limit": "0"}, "current_rate": 20, "retry_after": None},
+            window_seconds=600
+        )
+
+        assert limit.limit == 19
+        assert limit.remaining == 0
+        assert limit.detected_via == DetectionMethod.TESTING
+
     @pytest.mark.asyncio
     async def test_network_timeout_during_detection(self):
         """Тест обработки таймаутов сети во время определения лимитов"""